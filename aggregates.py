@@ -0,0 +1,145 @@
+import functools
+import inspect
+
+import numpy as np
+import pandas as pd
+
+import datastore
+
+# Rollups shared by layouts.py and callbacks.py. Each one is built once per dataset version and then
+# served as is, so callers must treat the returned frames as read-only.
+CASES = ['Confirmed', 'Deaths', 'Recovered', 'Active']
+
+_views = {}
+
+
+def materialized(*datasets):
+    # Views are rebuilt only when one of the datasets they read changes; no datasets means any of them.
+    def decorate(build):
+        signature = inspect.signature(build)
+
+        @functools.wraps(build)
+        def view(*args, **kwargs):
+            versions = tuple(datastore.version(name) for name in datasets) or (datastore.version(),)
+            # Keyed on every argument, defaults included, however the caller passed it.
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (build.__name__,) + tuple(bound.arguments.values())
+            entry = _views.get(key)
+            if entry is None or entry[0] != versions:
+                entry = _views[key] = (versions, build(*bound.args, **bound.kwargs))
+            return entry[1]
+
+        return view
+
+    return decorate
+
+
+# PAGE WORLD
+@materialized('full_grouped', 'day_wise')
+def world_share():
+    # Each country's share of the world total per day. Rows are aligned to day_wise by date position
+    # (one integer gather per column) instead of merging the two tables.
+    fg = datastore.full_grouped()
+    dw = datastore.day_wise()
+    pos = pd.Index(dw['Date']).get_indexer(fg['Date'])
+    rows = pos >= 0
+    pos = pos[rows]
+    share = fg.loc[rows, ['Date', 'Country/Region']].reset_index(drop=True)
+    for case in ['Confirmed', 'Deaths', 'Recovered']:
+        share['% ' + case] = np.round(fg[case].to_numpy()[rows] / dw[case].to_numpy()[pos], 3) * 100
+    return share
+
+
+@materialized('full_grouped')
+def share_series():
+    # Each country's share per metric, one list per country in the order px.bar draws them (first appearance).
+    share = world_share()
+    names = share['Country/Region'].unique().tolist()
+    series = {}
+    for case in ['Confirmed', 'Deaths', 'Recovered']:
+        table = share.pivot(index='Date', columns='Country/Region', values='% ' + case)
+        series[case] = table[names].T.to_numpy().tolist()
+    return series
+
+
+# PAGE WHO
+@materialized('full_grouped')
+def who_totals():
+    fg = datastore.full_grouped()
+    who = fg.groupby('WHO Region')[CASES].sum()
+    who['Fatality Rate in %'] = round((who['Deaths'] / who['Confirmed']) * 100, 2)
+    who['Recovery Rate in %'] = round((who['Recovered'] / who['Confirmed']) * 100, 2)
+    who.reset_index(inplace=True)
+    return who
+
+
+@materialized('full_grouped')
+def who_countries():
+    fg = datastore.full_grouped()
+    who_s = fg.groupby(['WHO Region', 'Country/Region'], observed=True)[CASES].sum()
+    who_s.reset_index(inplace=True)
+    return who_s
+
+
+@materialized('full_grouped')
+def who_sunburst():
+    who_s = who_countries().melt(id_vars=['WHO Region', 'Country/Region'], value_vars=['Recovered', 'Active', 'Deaths'],
+                                 var_name='Case', value_name='Count')
+    return datastore.plain(who_s)
+
+
+# PAGE OTHERS
+@materialized('full_grouped')
+def by_country():
+    # full_grouped ordered by country, then date, with each country's rows at a known [start, stop) offset.
+    fg = datastore.full_grouped()
+    ordered = fg.sort_values(['Country/Region', 'Date'], kind='stable').reset_index(drop=True)
+    codes = ordered['Country/Region'].cat.codes.to_numpy()
+    names = ordered['Country/Region'].cat.categories
+    bounds = np.searchsorted(codes, np.arange(len(names) + 1))
+    offsets = {name: (bounds[i], bounds[i + 1]) for i, name in enumerate(names)}
+    return ordered, offsets
+
+
+def country(name):
+    ordered, offsets = by_country()
+    start, stop = offsets[name]
+    return ordered.iloc[start:stop]
+
+
+def countries(names):
+    # Slices come back in country order, as a boolean-mask selection of full_grouped would.
+    ordered, offsets = by_country()
+    rows = np.concatenate([np.arange(*offsets[name]) for name in sorted(names)])
+    return datastore.observed(ordered.iloc[rows])
+
+
+@materialized('full_grouped')
+def country_names():
+    return list(by_country()[1])
+
+
+@materialized('policy_events')
+def events(name):
+    # (epoch milliseconds, label) pairs, the form plotly's add_vline takes on a date axis.
+    pe = datastore.policy_events()
+    pe = pe[pe['Country/Region'] == name].sort_values('Date')
+    return [(date.value // 10 ** 6, event) for date, event in zip(pe['Date'], pe['Event'])]
+
+
+@materialized('country_wise_latest')
+def top(n, by='Confirmed'):
+    cwl = datastore.country_wise_latest()
+    return datastore.observed(cwl.sort_values(by=by, ascending=False)[:n])
+
+
+@materialized('full_grouped', 'country_wise_latest')
+def top_series(n, by='Confirmed'):
+    return countries(top(n, by)['Country/Region'].tolist())
+
+
+@materialized('full_grouped')
+def region_countries(region):
+    who_s = who_countries()
+    return datastore.observed(who_s[who_s['WHO Region'] == region])
@@ -0,0 +1,87 @@
+/* Clientside callbacks registered in callbacks.py: interactions that only restyle a figure already in the browser. */
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+
+	figures: {
+		// A skeleton figure with a patch from patches.py applied: changed keys replaced, null ones removed.
+		patch: function (patch, skeleton) {
+			function merge(base, changes) {
+				var merged = Object.assign({}, base);
+				Object.keys(changes).forEach(function (key) {
+					if (changes[key] === null) {
+						delete merged[key];
+					} else {
+						merged[key] = changes[key];
+					}
+				});
+				return merged;
+			}
+
+			if (!patch) {
+				return skeleton;
+			}
+			if (patch.figure) {
+				return patch.figure;
+			}
+			return {
+				data: patch.data.map(function (changes, i) { return merge(skeleton.data[i] || {}, changes); }),
+				layout: merge(skeleton.layout, patch.layout)
+			};
+		}
+	},
+
+	world: {
+		// The world_series store's data, wanted only until it has been fetched once.
+		request: function (value, series) {
+			return series ? window.dash_clientside.no_update : value;
+		},
+
+		// fig1_5 and fig1_6 for another metric: its world total in its colour, and each country's share of it
+		// coloured from its palette. Waits for the world_series store on the first change.
+		update: function (value, series, cases, share) {
+			if (!series) {
+				return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+			}
+			return [
+				window.dash_clientside.world.cases(value, cases, series),
+				window.dash_clientside.world.share(value, share, series)
+			];
+		},
+
+		cases: function (value, figure, series) {
+			var trace = Object.assign({}, figure.data[0], {y: series.cases[value]});
+			trace.line = Object.assign({}, trace.line, {color: series.colors[value]});
+			if (trace.hovertemplate) {
+				trace.hovertemplate = trace.hovertemplate.replace(/<br>[^<]*=%\{y\}/, '<br>' + value + '=%{y}');
+			}
+			return Object.assign({}, figure, {data: [trace]});
+		},
+
+		share: function (value, figure, series) {
+			var palette = series.palettes[value];
+			var data = figure.data.map(function (trace, i) {
+				trace = Object.assign({}, trace, {y: series.share[value][i]});
+				trace.marker = Object.assign({}, trace.marker, {color: palette[i % palette.length]});
+				if (trace.hovertemplate) {
+					trace.hovertemplate = trace.hovertemplate.replace(/<br>[^<]*=%\{y\}/, '<br>% ' + value + '=%{y}');
+				}
+				return trace;
+			});
+			return Object.assign({}, figure, {data: data});
+		}
+	},
+
+	who: {
+		// fig2_2: the scatter built on the server, with the chosen axis types.
+		axes: function (figure, xaxisType, yaxisType) {
+			if (!figure) {
+				return window.dash_clientside.no_update;
+			}
+			var layout = Object.assign({}, figure.layout);
+			layout.xaxis = Object.assign({}, layout.xaxis, {type: xaxisType === 'Log' ? 'log' : 'linear'});
+			layout.yaxis = Object.assign({}, layout.yaxis, {type: yaxisType === 'Log' ? 'log' : 'linear'});
+			return Object.assign({}, figure, {layout: layout});
+		}
+	}
+
+});
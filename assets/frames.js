@@ -0,0 +1,85 @@
+/* Animation frame streaming for maps sent with only their latest frame (ANIMATION_STREAM=1, see frames.py). */
+
+(function () {
+
+	var POLL_MS = 500;
+
+	function frameUrl(gd, start, stop) {
+		return gd.layout.meta.frames_url + '?start=' + start + '&stop=' + stop;
+	}
+
+	function fetchChunk(gd, chunk) {
+		var stream = gd._frameStream;
+		if (stream.requested[chunk]) {
+			return stream.requested[chunk];
+		}
+		var size = gd.layout.meta.frames_chunk;
+		var start = chunk * size;
+		var stop = Math.min(start + size, gd.layout.meta.frames_count);
+		stream.requested[chunk] = fetch(frameUrl(gd, start, stop))
+			// A 404 means the data has been refreshed since this figure was built: its frames are gone.
+			.then(function (response) { return response.ok ? response.json() : []; })
+			.then(function (frames) {
+				// A newer figure (another metric) may have replaced this one while the request was in flight.
+				if (gd._frameStream === stream) {
+					return Plotly.addFrames(gd, frames);
+				}
+			});
+		return stream.requested[chunk];
+	}
+
+	function prefetch(gd, chunk) {
+		// Walk outwards from the chunk the slider is on, one request at a time.
+		var stream = gd._frameStream;
+		var chunks = Math.ceil(gd.layout.meta.frames_count / gd.layout.meta.frames_chunk);
+		var order = [];
+		for (var d = 0; d < chunks; d++) {
+			if (chunk - d >= 0) { order.push(chunk - d); }
+			if (d > 0 && chunk + d < chunks) { order.push(chunk + d); }
+		}
+		order.reduce(function (previous, next) {
+			return previous.then(function () {
+				if (gd._frameStream === stream) {
+					return fetchChunk(gd, next);
+				}
+			});
+		}, Promise.resolve());
+	}
+
+	function start(gd) {
+		var meta = gd.layout.meta;
+		gd._frameStream = {layout: gd.layout, requested: {}};
+		prefetch(gd, Math.floor((meta.frames_count - 1) / meta.frames_chunk));
+
+		if (!gd._frameStreamListening) {
+			gd._frameStreamListening = true;
+			gd.on('plotly_sliderchange', function (event) {
+				if (!gd._frameStream || gd._transitionData._frameHash[event.step.value]) {
+					return;
+				}
+				// Jumped ahead of the prefetch: load that chunk first, then show the requested frame.
+				var chunk = Math.floor(event.slider.active / gd.layout.meta.frames_chunk);
+				fetchChunk(gd, chunk).then(function () {
+					Plotly.animate(gd, [event.step.value], {mode: 'immediate', frame: {duration: 0, redraw: true},
+						transition: {duration: 0}});
+				});
+			});
+		}
+	}
+
+	setInterval(function () {
+		if (!window.Plotly) {
+			return;
+		}
+		var plots = document.querySelectorAll('.js-plotly-plot');
+		for (var i = 0; i < plots.length; i++) {
+			var gd = plots[i];
+			var meta = gd.layout && gd.layout.meta;
+			// Dash hands every new figure to Plotly.react, which replaces gd.layout and drops the fetched frames.
+			if (meta && meta.frames_url && (!gd._frameStream || gd._frameStream.layout !== gd.layout)) {
+				start(gd);
+			}
+		}
+	}, POLL_MS);
+
+})();
@@ -0,0 +1,110 @@
+import contextvars
+import functools
+
+import dash
+from dash.dependencies import Input, Output
+
+from app import app
+import config
+import datastore
+
+# BACKGROUND CALLBACKS
+# With BACKGROUND_CALLBACKS on, a slow figure callback answers its request by starting a job in a process forked
+# from the worker (so it shares the loaded data) and the browser polls for the job's progress and result, leaving
+# the worker free for other requests in between.
+
+
+class JobManager(dash.DiskcacheManager):
+    # Identical requests share one job: a request whose result is already in the job store, or is being built by a
+    # running job, attaches to it instead of starting another process. Cancelling a shared job cancels it for
+    # everyone waiting on it.
+    #
+    # Running jobs are recorded as key-job -> (pid, start time) and job-<pid> -> key. The start time tells the job
+    # from a later process that got its pid; the reverse entry lets a terminated job be forgotten at once.
+
+    def call_job_fn(self, key, job_fn, args, context):
+        import diskcache
+
+        # Workers on the box share the store, so the check and the start are one step for all of them.
+        with diskcache.Lock(self.handle, key + '-lock', expire=60):
+            if self.result_ready(key):
+                return 0
+            running = self.handle.get(key + '-job')
+            if running and started(running[0]) == running[1] and self.job_running(running[0]):
+                return running[0]
+            job = super().call_job_fn(key, job_fn, args, context)
+            self.handle.set(key + '-job', (job, started(job)), expire=config.BACKGROUND_EXPIRE)
+            self.handle.set('job-%d' % job, key, expire=config.BACKGROUND_EXPIRE)
+            return job
+
+    def job_running(self, job):
+        # A result that was already stored comes as job 0, which the renderer then leaves out of its polls.
+        return bool(job) and super().job_running(job)
+
+    def terminate_job(self, job):
+        if not job or not int(job):
+            return
+        key = self.handle.pop('job-%d' % int(job), None)
+        if key is not None:
+            self.handle.delete(key + '-job')
+        super().terminate_job(job)
+
+
+def started(job):
+    import psutil
+
+    try:
+        return psutil.Process(int(job)).create_time()
+    except psutil.NoSuchProcess:
+        return None
+
+
+def version():
+    # Results are kept per dataset version and figure settings, as figcache keys them.
+    return [datastore.version(), config.FIGURE_SETTINGS]
+
+
+def make_manager():
+    if not config.BACKGROUND_CALLBACKS:
+        return None
+    import diskcache
+
+    return JobManager(diskcache.Cache(config.BACKGROUND_DIR), cache_by=[version], expire=config.BACKGROUND_EXPIRE)
+
+
+manager = make_manager()
+
+# The set_progress of the job running in this process, if any.
+_progress = contextvars.ContextVar('progress', default=None)
+
+
+def progress(done, total):
+    # Moves the progress bar of the figure a background job is building; does nothing outside a job.
+    set_progress = _progress.get()
+    if set_progress is not None:
+        set_progress([done, total])
+
+
+def callback(graph, *dependencies):
+    # app.callback for a slow figure, run as a background job when BACKGROUND_CALLBACKS is on. While it runs the
+    # page shows <graph>_status, with a <graph>_progress bar and a <graph>_cancel button (see layouts.py).
+    def register(func):
+        if manager is None:
+            return app.callback(*dependencies)(func)
+
+        @functools.wraps(func)
+        def job(set_progress, *args):
+            token = _progress.set(set_progress)
+            try:
+                return func(*args)
+            finally:
+                _progress.reset(token)
+
+        app.callback(*dependencies, background=True, manager=manager, interval=config.BACKGROUND_INTERVAL,
+                     progress=[Output(graph + '_progress', 'value'), Output(graph + '_progress', 'max')],
+                     running=[(Output(graph + '_status', 'style'), {'display': 'block'}, {'display': 'none'}),
+                              (Output(graph + '_cancel', 'disabled'), False, True)],
+                     cancel=[Input(graph + '_cancel', 'n_clicks')])(job)
+        return func
+
+    return register
@@ -0,0 +1,150 @@
+import argparse
+import gc
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Callback and page benchmarks against the bundled data/ files.
+#
+#   python benchmark.py                  compare with benchmark.json, exit 1 on a regression
+#   python benchmark.py --save           write the results as the new benchmark.json
+#
+# Every figure callback runs over its whole option space (every country for the drill-downs), bypassing the
+# figure cache. Times are the best of --repeat runs, so the baseline is only comparable on similar hardware.
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark.json')
+
+# Differences below these are noise, whatever the threshold says.
+MIN_SECONDS = 0.1
+MIN_BYTES = 1024
+
+
+def options():
+    import aggregates
+    import warmup
+
+    countries = aggregates.country_names()
+    space = dict(warmup.OPTIONS)
+    space['update_graph3_5'] = [(c,) for c in countries]
+    space['update_graph3_6'] = list(itertools.product(warmup.NEW_CASES, countries))
+    return space
+
+
+def best(function, repeat):
+    # As timeit does, with the garbage collector off so its pauses do not land on whichever figure is running.
+    times = []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function()
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return result, min(times)
+
+
+def figures(repeat):
+    import callbacks  # Registers the figure callbacks with figcache.
+    import figcache
+
+    results = {}
+    for name, arg_sets in options().items():
+        for args in arg_sets:
+            fig, build = best(lambda: figcache.registry[name](*args), repeat)
+            (raw, sent), serialize = best(lambda: figcache.serialize(fig), repeat)
+            results['%s%r' % (name, args)] = {'build': round(build, 4), 'serialize': round(serialize, 4),
+                                              'bytes': len(sent), 'raw_bytes': len(raw)}
+    return results
+
+
+def pages():
+    from plotly.utils import PlotlyJSONEncoder
+
+    import layouts
+
+    results = {}
+    for page in [layouts.world, layouts.who, layouts.others]:
+        start = time.perf_counter()
+        layout = page()
+        build = time.perf_counter() - start
+        results['page ' + page.__name__] = {'build': round(build, 4),
+                                            'bytes': len(json.dumps(layout, cls=PlotlyJSONEncoder))}
+    return results
+
+
+def import_time():
+    # In a fresh interpreter, as a worker would import it.
+    code = 'import time; start = time.perf_counter(); import layouts; print(time.perf_counter() - start)'
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=os.path.dirname(BASELINE))
+    return {'import layouts': {'build': round(float(output.decode().split()[-1]), 4)}}
+
+
+def run(repeat=3):
+    results = import_time()
+    results.update(figures(repeat))
+    results.update(pages())
+    return results
+
+
+def totals(results):
+    # Times summed over each callback's option space: single figures of a few tens of milliseconds are too noisy
+    # to compare one by one, while payload sizes are exact and are compared per figure.
+    summed = {}
+    for key, result in results.items():
+        name = key.split('(')[0]
+        for metric, value in result.items():
+            if not metric.endswith('bytes'):
+                summed.setdefault(name, {}).setdefault(metric, 0)
+                summed[name][metric] += value
+    return summed
+
+
+def regressions(results, baseline, threshold):
+    found = []
+    sizes = {key: {m: v for m, v in result.items() if m.endswith('bytes')} for key, result in results.items()}
+    old_sizes = {key: {m: v for m, v in result.items() if m.endswith('bytes')} for key, result in baseline.items()}
+    for measured, before_all, floor in [(totals(results), totals(baseline), MIN_SECONDS),
+                                        (sizes, old_sizes, MIN_BYTES)]:
+        for key, result in measured.items():
+            for metric, value in result.items():
+                before = before_all.get(key, {}).get(metric)
+                if before is not None and value > before * (1 + threshold) and value - before > floor:
+                    found.append((key, metric, before, value))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark figure callbacks and pages.')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true', help='write the results as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.5, help='allowed slowdown or growth, as a fraction')
+    parser.add_argument('--repeat', type=int, default=3)
+    arguments = parser.parse_args()
+
+    results = run(arguments.repeat)
+    for key, result in results.items():
+        print('benchmark: %-60s %s' % (key, '  '.join('%s=%.3f' % (metric, value) if isinstance(value, float)
+                                                      else '%s=%d' % (metric, value)
+                                                      for metric, value in result.items())))
+    if arguments.save:
+        with open(arguments.baseline, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print('benchmark: %d results saved to %s' % (len(results), arguments.baseline))
+        return 0
+
+    with open(arguments.baseline) as f:
+        baseline = json.load(f)
+    found = regressions(results, baseline, arguments.threshold)
+    for key, metric, before, value in found:
+        print('regression: %s %s %.3f -> %.3f' % (key, metric, before, value))
+    print('benchmark: %d results, %d regressions beyond %d%%' % (len(results), len(found),
+                                                                 arguments.threshold * 100))
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('WARMUP', '0')
+    sys.exit(main())
@@ -1,41 +1,27 @@
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import plotly.express as px
-import pandas as pd
-import datetime
 
 from app import app
-
-# DATA MAPPING
-fg_filepath = 'data/full_grouped.csv'
-cwl_filepath = 'data/country_wise_latest.csv'
-dw_filepath = 'data/day_wise.csv'
-wm_filepath = 'data/worldometer_data.csv'
-
-# IMPORT DATA
-fg = pd.read_csv(fg_filepath)
-cwl = pd.read_csv(cwl_filepath)
-dw = pd.read_csv(dw_filepath)
-wm = pd.read_csv(wm_filepath)
+import background
+import datastore
+import aggregates
+import figcache
+import frames
+import layouts
+import patches
 
 
 # PAGE WORLD
-@app.callback(
-    Output('fig1_4', 'figure'),
-    [Input('user_choice_world', 'value')]
-)
-def update_graph1_4(value):
-
-    if value == 'Confirmed':
-        n = px.colors.sequential.Burg
-    elif value == 'Recovered':
-        n = px.colors.sequential.algae
-    elif value == 'Deaths':
-        n = px.colors.sequential.Purp
-
-    fig1_4 = px.choropleth(fg, locations='Country/Region', color=value, locationmode='country names',
-                           animation_frame='Date',
+@frames.streams('fig1_4', ['Confirmed', 'Recovered', 'Deaths'])
+def choropleth(value):
+    df = frames.animation_data(datastore.full_grouped())
+    background.progress(1, 3)
+
+    fig1_4 = px.choropleth(df, locations='Country/Region', color=value,
+                           locationmode='country names',
+                           animation_frame=frames.animation_frame(),
                            projection='natural earth',
-                           color_continuous_scale=n,
+                           color_continuous_scale=layouts.WORLD_PALETTES[value],
                            hover_name='Country/Region', hover_data={'Country/Region': False}
                            )\
         .update_layout(title={'text': 'Cases over time by country',
@@ -43,94 +29,63 @@ def update_graph1_4(value):
                               'x': 0.5,
                               }
                        )
+    background.progress(2, 3)
     return fig1_4
 
 
-@app.callback(
-    Output('fig1_5', 'figure'),
+@background.callback(
+    'fig1_4',
+    Output('fig1_4', 'figure'),
     [Input('user_choice_world', 'value')]
 )
-def update_graph1_5(value):
-
-    if value == 'Confirmed':
-        c = ['rgb(231,41,138)']
-    elif value == 'Recovered':
-        c = ['rgb(27,158,119)']
-    elif value == 'Deaths':
-        c = ['rgb(117,112,179)']
-
-    fig1_5 = px.line(dw, x='Date', y=value, width=950, color_discrete_sequence=c)\
-        .update_layout(plot_bgcolor='white',
-                       title={'text': 'Cases over time',
-                              'y': 0.9,
-                              'x': 0.5,
-                              },
-                       xaxis=dict(title='',
-                                  showline=False,
-                                  showgrid=True,
-                                  gridcolor='rgb(204, 204, 204)'
-                                  ),
-                       yaxis=dict(title='',
-                                  showline=False,
-                                  showgrid=True, gridcolor='rgb(204, 204, 204)',
-                                  zeroline=True, zerolinewidth=4, zerolinecolor='rgb(204, 204, 204)'
-                                  )
-                       )
-    return fig1_5
+@figcache.memoize
+def update_graph1_4(value):
+    return frames.figure('fig1_4', value)
+
+
+# One dropdown drives the whole row: fig1_4 is built here, while fig1_5 and fig1_6 arrive with the page for
+# 'Confirmed' and switch metric together in the browser from the world_series store (see assets/clientside.js).
+# The store is filled on the first change of metric: world.request asks for it only while it is still empty.
+app.clientside_callback(
+    ClientsideFunction(namespace='world', function_name='request'),
+    Output('world_series_wanted', 'data'),
+    Input('user_choice_world', 'value'),
+    State('world_series', 'data'),
+    prevent_initial_call=True
+)
 
 
 @app.callback(
-    Output('fig1_6', 'figure'),
-    [Input('user_choice_world', 'value')]
+    Output('world_series', 'data'),
+    Input('world_series_wanted', 'data'),
+    prevent_initial_call=True
 )
-def update_graph1_6(value):
-
-    temp = pd.merge(fg[['Date', 'Country/Region', 'Confirmed', 'Deaths', 'Recovered']],
-                    dw[['Date', 'Confirmed', 'Deaths', 'Recovered']], on='Date')
-    temp['% Confirmed'] = round(temp['Confirmed_x'] / temp['Confirmed_y'], 3) * 100
-    temp['% Deaths'] = round(temp['Deaths_x'] / temp['Deaths_y'], 3) * 100
-    temp['% Recovered'] = round(temp['Recovered_x'] / temp['Recovered_y'], 3) * 100
-
-    if value == 'Confirmed':
-        c = px.colors.sequential.Burg
-    elif value == 'Recovered':
-        c = px.colors.sequential.algae
-    elif value == 'Deaths':
-        c = px.colors.sequential.Purp
+def load_world_series(_):
+    return layouts.world_series()
 
-    fig1_6 = px.bar(temp, x='Date', y='% ' + value, color='Country/Region',
-                    range_y=(0, 100),
-                    color_discrete_sequence=c
-                    )\
-        .update_layout(plot_bgcolor='white',
-                       title={'text': '% Cases over time by country',
-                              'y': 0.9,
-                              'x': 0.5,
-                              },
-                       showlegend=False,
-                       xaxis=dict(title='',
-                                  showline=False,
-                                  ),
-                       yaxis=dict(title='',
-                                  showline=False,
-                                  showgrid=True, gridcolor='rgb(204, 204, 204)'
-                                  )
-                       )
 
-    return fig1_6
+app.clientside_callback(
+    ClientsideFunction(namespace='world', function_name='update'),
+    Output('fig1_5', 'figure'),
+    Output('fig1_6', 'figure'),
+    Input('user_choice_world', 'value'),
+    Input('world_series', 'data'),
+    State('fig1_5', 'figure'),
+    State('fig1_6', 'figure'),
+    prevent_initial_call=True
+)
 
 
 # PAGE WHO
 @app.callback(
-    Output('fig2_2', 'figure'),
+    Output('fig2_2_base', 'data'),
     Input('value_x', 'value'),
     Input('value_y', 'value'),
-    Input('xaxis_type', 'value'),
-    Input('yaxis_type', 'value'),
 )
-def update_graph2_2(value_x, value_y, xaxis_type, yaxis_type):
+@figcache.memoize
+def update_graph2_2(value_x, value_y):
 
-    fig2_2 = px.scatter(wm, y=value_y, color='WHO Region', x=value_x,
+    fig2_2 = px.scatter(datastore.worldometer_data(), y=value_y, color='WHO Region', x=value_x,
                         hover_name='Country/Region',
                         color_discrete_map={'Europe': 'rgb(127, 60, 141)',
                                             'WesternPacific': 'rgb(242, 183, 1)',
@@ -149,23 +104,29 @@ def update_graph2_2(value_x, value_y, xaxis_type, yaxis_type):
                                   showgrid=True, gridcolor='rgb(204, 204, 204)'
                                   ),
                        height=465,
-                       )\
-        .update_xaxes(type='log' if xaxis_type == 'Log' else 'linear') \
-        .update_yaxes(type='log' if yaxis_type == 'Log' else 'linear')
+                       )
 
     return fig2_2
 
 
+# Linear/Log only changes the axis type, so it is set in the browser on the figure built above.
+app.clientside_callback(
+    ClientsideFunction(namespace='who', function_name='axes'),
+    Output('fig2_2', 'figure'),
+    Input('fig2_2_base', 'data'),
+    Input('xaxis_type', 'value'),
+    Input('yaxis_type', 'value')
+)
+
+
 @app.callback(
     Output('fig2_3', 'figure'),
     Input('user_choice_who', 'value')
 )
+@figcache.memoize
 def update_graph2_3(value):
 
-    who = fg.groupby('WHO Region')['Confirmed', 'Deaths', 'Recovered', 'Active'].sum()
-    who['Fatality Rate in %'] = round((who['Deaths'] / who['Confirmed']) * 100, 2)
-    who['Recovery Rate in %'] = round((who['Recovered'] / who['Confirmed']) * 100, 2)
-    who.reset_index(inplace=True)
+    who = aggregates.who_totals()
 
     fig2_3 = px.bar(who.sort_values(value), y=value, x='WHO Region', text=value, color='WHO Region',
                     color_discrete_map={'Europe': 'rgb(127, 60, 141)',
@@ -195,15 +156,36 @@ def update_graph2_3(value):
 
 
 # PAGE OTHERS
+def patched(graph):
+    # The page's skeleton figure, then whatever the patch callback below sends on a change of dropdown.
+    app.clientside_callback(
+        ClientsideFunction(namespace='figures', function_name='patch'),
+        Output(graph, 'figure'),
+        Input(graph + '_patch', 'data'),
+        Input(graph + '_skeleton', 'data')
+    )
+
+
+patched('fig3_1')
+patched('fig3_4')
+patched('fig3_6')
+
+
 @app.callback(
-    Output('fig3_1', 'figure'),
-    Input('user_choice_top', 'value')
+    Output('fig3_1_patch', 'data'),
+    Input('user_choice_top', 'value'),
+    Input('top_n', 'value'),
+    State('fig3_1_skeleton_version', 'data'),
+    prevent_initial_call=True
 )
-def update_graph3_1(value):
+def patch_graph3_1(value, n, version):
+    return patches.patch('fig3_1', (value, n), version)
+
+
+@figcache.memoize
+def update_graph3_1(value, n):
 
-    top = cwl.sort_values(by='Confirmed', ascending=False)[:10]
-    top_country = top['Country/Region'].values
-    fg_top = fg[fg['Country/Region'].isin(top_country)]
+    fg_top = aggregates.top_series(n)
 
     fig3_1 = px.line(fg_top, x='Date', y=value, color='Country/Region',
                      color_discrete_map={'US': 'rgb(127, 60, 141)',
@@ -247,15 +229,19 @@ def update_graph3_1(value):
 
 
 @app.callback(
-    Output('fig3_4', 'figure'),
-    Input('user_choice_europe', 'value')
+    Output('fig3_4_patch', 'data'),
+    Input('user_choice_europe', 'value'),
+    State('fig3_4_skeleton_version', 'data'),
+    prevent_initial_call=True
 )
+def patch_graph3_4(value, version):
+    return patches.patch('fig3_4', (value,), version)
+
+
+@figcache.memoize
 def update_graph3_4(value):
 
-    europe = fg.groupby(['WHO Region', 'Country/Region'])[
-        'WHO Region', 'Confirmed', 'Deaths', 'Recovered', 'Active'].sum()
-    europe.reset_index(inplace=True)
-    europe = europe[europe['WHO Region'] == 'Europe']
+    europe = aggregates.region_countries('Europe')
 
     if value == 'Confirmed':
         c = ['rgb(231,41,138)']
@@ -290,26 +276,67 @@ def update_graph3_4(value):
     return fig3_4
 
 
+def add_events(fig, country):
+    for date, event in aggregates.events(country):
+        fig.add_vline(x=date, line_width=0.5, line_dash="dot",
+                      annotation_text=event,
+                      annotation_textangle=-90,
+                      annotation_position='left top'
+                      )
+    return fig
+
+
 @app.callback(
-    Output('fig3_6', 'figure'),
-    Input('user_choice_poland', 'value')
+    Output('fig3_5', 'figure'),
+    Input('user_choice_country', 'value')
 )
-def update_graph3_6(value):
-
-    fg_poland = fg[fg['Country/Region'] == 'Poland']
-    fg_poland = fg_poland[fg_poland['Confirmed'] > 0]
-
-    d_1 = datetime.datetime.strptime('2020-03-16', "%Y-%m-%d").timestamp() * 1000  # School closures
-    d_2 = datetime.datetime.strptime('2020-03-20', "%Y-%m-%d").timestamp() * 1000  # Epidemic State of Emergency
-    d_3 = datetime.datetime.strptime('2020-03-25', "%Y-%m-%d").timestamp() * 1000  # Movement restrictions
-    d_4 = datetime.datetime.strptime('2020-04-20',
-                                     "%Y-%m-%d").timestamp() * 1000  # Defrosting of the Polish economy - Stage I
-    d_5 = datetime.datetime.strptime('2020-05-04',
-                                     "%Y-%m-%d").timestamp() * 1000  # Defrosting of the Polish economy - Stage II
-    d_6 = datetime.datetime.strptime('2020-05-18',
-                                     "%Y-%m-%d").timestamp() * 1000  # Defrosting of the Polish economy - Stage III
-    d_7 = datetime.datetime.strptime('2020-05-30',
-                                     "%Y-%m-%d").timestamp() * 1000  # Defrosting of the Polish economy - Stage IV
+@figcache.memoize
+def update_graph3_5(country):
+
+    fg_country = aggregates.country(country)
+    fg_country = fg_country[fg_country['Confirmed'] > 0]
+
+    fig3_5 = px.line(fg_country, x='Date', y=['Confirmed', 'Deaths', 'Recovered', 'Active'],
+                     labels={'variable': 'Cases'},
+                     title='Basic Statistics of Covid 19 in ' + country,
+                     color_discrete_map={'Confirmed': 'rgb(231,41,138)',
+                                         'Deaths': 'rgb(117,112,179)',
+                                         'Recovered': 'rgb(27,158,119)',
+                                         'Active': 'rgb(217,95,2)'
+                                         }
+                     ) \
+        .update_layout(plot_bgcolor='white',
+                       title={
+                           'y': 0.95,
+                           'x': 0.5,
+                       },
+                       xaxis_title='',
+                       yaxis=dict(title='',
+                                  showline=False,
+                                  showgrid=True, gridcolor='rgb(204, 204, 204)',
+                                  zeroline=True, zerolinewidth=4, zerolinecolor='rgb(204, 204, 204)'
+                                  ),
+                       height=790
+                       )
+    return add_events(fig3_5, country)
+
+
+@app.callback(
+    Output('fig3_6_patch', 'data'),
+    Input('user_choice_poland', 'value'),
+    Input('user_choice_country', 'value'),
+    State('fig3_6_skeleton_version', 'data'),
+    prevent_initial_call=True
+)
+def patch_graph3_6(value, country, version):
+    return patches.patch('fig3_6', (value, country), version)
+
+
+@figcache.memoize
+def update_graph3_6(value, country):
+
+    fg_country = aggregates.country(country)
+    fg_country = fg_country[fg_country['Confirmed'] > 0]
 
     if value == 'New recovered':
         c = ['rgb(27,158,119)']
@@ -318,45 +345,10 @@ def update_graph3_6(value):
     elif value == 'New cases':
         c = ['rgb(217,95,2)']
 
-    fig3_6 = px.bar(fg_poland, x='Date', y=value,
-                    title=value + ' in Poland over time',
+    fig3_6 = px.bar(fg_country, x='Date', y=value,
+                    title=value + ' in ' + country + ' over time',
                     color_discrete_sequence=c
                     ) \
-        .add_vline(x=d_1, line_width=0.5, line_dash="dot",
-                   annotation_text='School closures',
-                   annotation_textangle=-90,
-                   annotation_position='left top'
-                   ) \
-        .add_vline(x=d_2, line_width=0.5, line_dash="dot",
-                   annotation_text='Epidemic State of Emergency',
-                   annotation_textangle=-90,
-                   annotation_position='left top'
-                   ) \
-        .add_vline(x=d_3, line_width=0.5, line_dash="dot",
-                   annotation_text='Movement restrictions',
-                   annotation_textangle=-90,
-                   annotation_position='left top'
-                   ) \
-        .add_vline(x=d_4, line_width=0.5, line_dash="dot",
-                   annotation_text='Defrosting of the Polish economy - Stage I',
-                   annotation_textangle=-90,
-                   annotation_position='left top'
-                   ) \
-        .add_vline(x=d_5, line_width=0.5, line_dash="dot",
-                   annotation_text='Defrosting of the Polish economy - Stage II',
-                   annotation_textangle=-90,
-                   annotation_position='left top'
-                   ) \
-        .add_vline(x=d_6, line_width=0.5, line_dash="dot",
-                   annotation_text='Defrosting of the Polish economy - Stage III',
-                   annotation_textangle=-90,
-                   annotation_position='left top'
-                   ) \
-        .add_vline(x=d_7, line_width=0.5, line_dash="dot",
-                   annotation_text='Defrosting of the Polish economy - Stage IV',
-                   annotation_textangle=-90,
-                   annotation_position='left top'
-                   ) \
         .update_layout(title={'y': 0.95,
                               'x': 0.5,
                               },
@@ -368,4 +360,4 @@ def update_graph3_6(value):
                                   ),
                        height=750
                        )
-    return fig3_6
+    return add_events(fig3_6, country)
@@ -0,0 +1,88 @@
+import datetime
+
+# Shrinks serialized figures before they are cached and sent: per-country traces repeat their styling and
+# their dates, which is most of the payload of the multi-trace charts. The figure draws the same.
+DAY_MS = 24 * 60 * 60 * 1000
+
+# Trace attributes that say which data a trace shows; never moved into the template.
+OWN = {'type', 'name', 'uid', 'xaxis', 'yaxis', 'legendgroup', 'offsetgroup', 'customdata', 'ids',
+       'x', 'x0', 'dx', 'y', 'z', 'text', 'locations', 'lat', 'lon'}
+
+
+def figure(fig):
+    data = fig.get('data', [])
+    template = fig.get('layout', {}).get('template', {}).get('data')
+    for trace in data:
+        dates(trace)
+        numbers(trace)
+    if template is not None:
+        hoist(data, template)
+        # Template entries only apply to traces of their own type.
+        used = {trace.get('type', 'scatter') for trace in data}
+        for name in list(template):
+            if name not in used:
+                del template[name]
+    return fig
+
+
+def dates(trace):
+    # Midnight timestamps lose their time part, and an evenly spaced date axis becomes a start and a step.
+    x = trace.get('x')
+    if not x or not isinstance(x[0], str) or not x[0].endswith('T00:00:00'):
+        return
+    days = [s[:-len('T00:00:00')] for s in x]
+    trace['x'] = days
+    if len(days) < 3 or trace.get('type') not in ('bar', 'scatter', 'scattergl'):
+        return
+    try:
+        stamps = [datetime.date.fromisoformat(day).toordinal() for day in days]
+    except ValueError:
+        return
+    step = stamps[1] - stamps[0]
+    if step > 0 and all(b - a == step for a, b in zip(stamps, stamps[1:])):
+        del trace['x']
+        trace['x0'] = days[0]
+        trace['dx'] = step * DAY_MS
+
+
+def numbers(trace):
+    for axis in ('x', 'y'):
+        values = trace.get(axis)
+        if values and isinstance(values[0], float):
+            trace[axis] = shorten(values)
+
+
+def shorten(values):
+    # Values like 12.300000000000001 (a rounded share times 100) print with 15 significant digits at most.
+    return [float('%.15g' % v) if isinstance(v, float) else v for v in values]
+
+
+def hoist(data, template):
+    # Settings every trace of a type shares move to that type's template entry, once per figure.
+    types = {}
+    for trace in data:
+        types.setdefault(trace.get('type', 'scatter'), []).append(trace)
+    for name, traces in types.items():
+        if len(traces) < 2 or len(template.get(name, [{}])) > 1:
+            continue
+        entry = template.setdefault(name, [{'type': name}])[0]
+        shared(traces, entry, OWN)
+
+
+def shared(traces, entry, own):
+    for key in list(traces[0]):
+        if key in own or key.endswith('src'):
+            continue
+        value = traces[0][key]
+        if isinstance(value, dict):
+            if all(isinstance(trace.get(key), dict) for trace in traces):
+                shared([trace[key] for trace in traces], entry.setdefault(key, {}), ())
+                for trace in traces:
+                    if not trace[key]:
+                        del trace[key]
+                if not entry[key]:
+                    del entry[key]
+        elif not isinstance(value, list) and all(key in trace and trace[key] == value for trace in traces):
+            entry[key] = value
+            for trace in traces:
+                del trace[key]
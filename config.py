@@ -0,0 +1,98 @@
+import os
+
+# Deployment settings, overridable through environment variables (e.g. in the Procfile or the gunicorn env).
+
+# FIGURE CACHE
+# Large enough for every figure warmup.py builds (45) plus drill-downs into other countries.
+FIGURE_CACHE_SIZE = int(os.environ.get('FIGURE_CACHE_SIZE', 128))
+
+# 'memory' keeps figures per worker; 'disk' and 'redis' share them between all workers on the box.
+FIGURE_CACHE_BACKEND = os.environ.get('FIGURE_CACHE_BACKEND', 'memory')
+FIGURE_CACHE_DIR = os.environ.get('FIGURE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                   '.figcache'))
+FIGURE_CACHE_URL = os.environ.get('FIGURE_CACHE_URL', 'redis://localhost:6379/0')
+# Seconds a cached figure stays valid, in every tier; 0 keeps it until the dataset version changes.
+FIGURE_CACHE_TTL = int(os.environ.get('FIGURE_CACHE_TTL', 0))
+# Figures kept in FIGURE_CACHE_DIR, oldest written removed first, so old data versions do not pile up; 0 for no
+# limit. Redis bounds itself with its maxmemory policy.
+FIGURE_CACHE_DISK_SIZE = int(os.environ.get('FIGURE_CACHE_DISK_SIZE', 1024))
+
+# WARM-UP
+# Build every dropdown-driven figure in the background when a worker starts, so no user pays for the first build.
+WARMUP = os.environ.get('WARMUP', '1') == '1'
+WARMUP_PROCESSES = int(os.environ.get('WARMUP_PROCESSES', os.cpu_count() or 1))
+
+# ANIMATED MAPS
+# Dates shipped as animation frames: 'daily', 'weekly' or every N days, counted back from the latest date.
+ANIMATION_FRAMES = os.environ.get('ANIMATION_FRAMES', 'daily')
+ANIMATION_STEP = {'daily': 1, 'weekly': 7}.get(ANIMATION_FRAMES) or int(ANIMATION_FRAMES)
+# Send only the latest date instead of the whole animation.
+ANIMATION_KEYFRAME = os.environ.get('ANIMATION_KEYFRAME', '0') == '1'
+# Send the latest date with the figure and let the browser fetch the other frames from /frames (see frames.py).
+ANIMATION_STREAM = os.environ.get('ANIMATION_STREAM', '0') == '1'
+# Dates per /frames request made by assets/frames.js, and how long browsers and proxies may cache the answer.
+ANIMATION_CHUNK = int(os.environ.get('ANIMATION_CHUNK', 14))
+FRAMES_MAX_AGE = int(os.environ.get('FRAMES_MAX_AGE', 24 * 60 * 60))
+
+# Strip repeated per-trace styling and dates from figures before they are cached and sent (see compact.py).
+FIGURE_COMPACT = os.environ.get('FIGURE_COMPACT', '1') == '1'
+
+# After the first render, send dropdown changes of the Others page charts as differences from the figure the page
+# came with rather than whole figures (see patches.py).
+FIGURE_PATCHES = os.environ.get('FIGURE_PATCHES', '1') == '1'
+
+# Settings that change the figures themselves, so cached figures built under other values are not served.
+FIGURE_SETTINGS = [ANIMATION_STEP, ANIMATION_KEYFRAME, ANIMATION_STREAM, FIGURE_COMPACT]
+
+# DATA SNAPSHOTS
+# Serve the data/ CSVs from memory-mapped NumPy snapshots, rebuilt whenever a CSV is newer than its snapshot.
+SNAPSHOTS = os.environ.get('SNAPSHOTS', '1') == '1'
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data',
+                                                           'snapshot'))
+# 'mtime' trusts the CSV size and modification time; 'hash' compares a SHA-1 of its contents.
+SNAPSHOT_CHECK = os.environ.get('SNAPSHOT_CHECK', 'mtime')
+
+# HTTP
+# Responses of at least this many bytes are gzip (or, with the brotli package, brotli) compressed for clients that
+# accept it; 0 sends everything uncompressed.
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+# Compressed responses kept per worker, so a cached figure is compressed once rather than on every request.
+COMPRESS_CACHE_SIZE = int(os.environ.get('COMPRESS_CACHE_SIZE', 128))
+# How long browsers may keep files from assets/, whose URLs change whenever the file does.
+ASSETS_MAX_AGE = int(os.environ.get('ASSETS_MAX_AGE', 365 * 24 * 60 * 60))
+
+# METRICS
+# Label callback metrics with the callback's input values as well as its id. Page routing is never labelled (its
+# input is whatever URL a client asks for), and past METRICS_INPUT_SERIES distinct inputs per callback (the
+# country drill-downs alone have 187) the rest are counted as inputs="other", so the number of series stays bounded.
+METRICS_INPUT_LABELS = os.environ.get('METRICS_INPUT_LABELS', '0') == '1'
+METRICS_INPUT_SERIES = int(os.environ.get('METRICS_INPUT_SERIES', 50))
+
+# PROFILING
+# Profile every server callback (or only the callback ids listed in PROFILE_CALLBACKS, e.g. 'fig1_4.figure')...
+PROFILE = os.environ.get('PROFILE', '0') == '1'
+PROFILE_CALLBACKS = [c for c in os.environ.get('PROFILE_CALLBACKS', '').split(',') if c]
+# ...or only requests sending this header with PROFILE_TOKEN as its value. Without a token the header is ignored.
+PROFILE_HEADER = os.environ.get('PROFILE_HEADER', 'X-Profile')
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+# 'sample' records stacks every PROFILE_INTERVAL seconds for flame graphs; 'cprofile' traces every call.
+PROFILE_MODE = os.environ.get('PROFILE_MODE', 'sample')
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.001))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+
+# BACKGROUND CALLBACKS
+# Build the animated map in a job process instead of the web worker, which stays free for other requests while the
+# browser polls for progress and the result (see background.py). Needs the optional diskcache, multiprocess and
+# psutil packages (pip install "dash[diskcache]"), which are not in requirements.txt.
+BACKGROUND_CALLBACKS = os.environ.get('BACKGROUND_CALLBACKS', '0') == '1'
+# Job store shared by all workers on the box, and how long a finished figure stays there for identical requests.
+BACKGROUND_DIR = os.environ.get('BACKGROUND_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                               '.background'))
+BACKGROUND_EXPIRE = int(os.environ.get('BACKGROUND_EXPIRE', 10 * 60))
+# Milliseconds between the browser's polls for a job's progress.
+BACKGROUND_INTERVAL = int(os.environ.get('BACKGROUND_INTERVAL', 500))
+
+# DATA REFRESH
+# Seconds between checks for updated data files, made by each worker between requests; 0 turns refreshing off.
+REFRESH_INTERVAL = int(os.environ.get('REFRESH_INTERVAL', 60))
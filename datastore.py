@@ -0,0 +1,206 @@
+import hashlib
+import os
+
+import pandas as pd
+
+import config
+import derive
+import snapshot
+
+# DATA MAPPING
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+FILES = {
+    'full_grouped': 'full_grouped.csv',
+    'worldometer_data': 'worldometer_data.csv',
+    # Dated policy measures drawn on the country drill-down charts, any number per country.
+    'policy_events': 'policy_events.csv',
+}
+
+# Case counts stay well below 2**31 (largest is the world total in day_wise), so int32 halves their footprint.
+COUNTS = ['Confirmed', 'Deaths', 'Recovered', 'Active', 'New cases', 'New deaths', 'New recovered']
+
+DTYPES = {
+    'full_grouped': dict({'Country/Region': 'category', 'WHO Region': 'category'},
+                         **{c: 'int32' for c in COUNTS}),
+    'worldometer_data': {'Country/Region': 'category', 'Continent': 'category', 'WHO Region': 'category',
+                         'TotalCases': 'int32'},
+    'policy_events': {'Country/Region': 'category'},
+}
+
+PARSE_DATES = {
+    'full_grouped': ['Date'],
+    'policy_events': ['Date'],
+}
+
+# Tables computed from full_grouped rather than read from their own CSVs (the copies in data/ are no longer
+# loaded), so they always agree with it. Daily totals only need the new dates when full_grouped grows.
+DERIVED = {
+    'day_wise': derive.day_wise,
+    'country_wise_latest': derive.country_wise_latest,
+}
+INCREMENTAL = ['day_wise']
+
+# Rows are only ever appended to these files, one new date at a time, so a refresh can parse just the tail.
+APPEND_ONLY = ['full_grouped']
+
+# The data this process serves: the frames loaded so far and the stamp of the file each one came from.
+# A refresh builds a new dict and rebinds it, so readers see either the old data or the new, never a mix.
+_current = {'frames': {}, 'stamps': {}}
+
+
+# IMPORT DATA
+def csv_path(name):
+    return os.path.join(DATA_DIR, FILES[name])
+
+
+def read_csv(name):
+    df = pd.read_csv(csv_path(name),
+                     dtype=DTYPES.get(name),
+                     parse_dates=PARSE_DATES.get(name, False))
+    # The chunked CSV reader leaves categories in order of appearance; groupbys expect them sorted.
+    for c in df.select_dtypes('category').columns:
+        df[c] = df[c].cat.reorder_categories(sorted(df[c].cat.categories))
+    return df
+
+
+def read(name):
+    if not config.SNAPSHOTS:
+        return read_csv(name)
+    df = snapshot.load(name, csv_path(name))
+    if df is None:
+        df = read_csv(name)
+        try:
+            snapshot.write(name, df, csv_path(name))
+        except OSError:
+            pass  # A read-only checkout simply keeps parsing the CSV.
+    return df
+
+
+def get(name):
+    # Each dataset is parsed once per process and shared by every module that asks for it.
+    current = _current
+    if name not in current['frames']:
+        if name in DERIVED:
+            current['frames'][name] = DERIVED[name](get('full_grouped'))
+        else:
+            current['stamps'].setdefault(name, stamp(name))
+            current['frames'][name] = read(name)
+    return current['frames'][name]
+
+
+def preload():
+    for name in list(FILES) + list(DERIVED):
+        get(name)
+
+
+def stamp(name):
+    st = os.stat(csv_path(name))
+    return '%d:%d' % (st.st_mtime_ns, st.st_size)
+
+
+def version(name=None):
+    # Identifies the data this process serves, either one dataset or all of them; anything derived from the
+    # data is keyed on it.
+    stamps = _current['stamps']
+    for n in FILES:
+        stamps.setdefault(n, stamp(n))
+    if name in DERIVED:
+        return stamps['full_grouped']
+    if name is not None:
+        return stamps[name]
+    digest = hashlib.md5()
+    for n in sorted(FILES):
+        digest.update(('%s:%s;' % (n, stamps[n])).encode())
+    return digest.hexdigest()[:12]
+
+
+# REFRESH
+def read_tail(name, skip):
+    df = pd.read_csv(csv_path(name),
+                     skiprows=range(1, skip + 1),
+                     dtype=DTYPES.get(name),
+                     parse_dates=PARSE_DATES.get(name, False))
+    return df
+
+
+def extend(df, tail):
+    # Categories are merged and re-sorted so codes stay comparable between the old rows and the new ones.
+    for c in df.select_dtypes('category').columns:
+        categories = sorted(set(df[c].cat.categories) | set(tail[c].dropna()))
+        df = df.assign(**{c: df[c].cat.set_categories(categories)})
+        tail = tail.assign(**{c: pd.Categorical(tail[c], categories=categories)})
+    return pd.concat([df, tail], ignore_index=True)
+
+
+def appended(name, df):
+    # The rows added to an append-only file since df was read, or None when it changed in any other way.
+    if name in APPEND_ONLY:
+        tail = read_tail(name, len(df))
+        if len(tail) and tail['Date'].min() > df['Date'].max():
+            return tail
+    return None
+
+
+def refresh():
+    # Picks up changed data files and swaps them in as one new version; returns the names that changed.
+    global _current
+    current = _current
+    changed = [name for name in FILES if stamp(name) != version(name)]
+    if not changed:
+        return changed
+    frames = dict(current['frames'])
+    stamps = dict(current['stamps'])
+    for name in changed:
+        stamps[name] = stamp(name)
+        if name not in frames:
+            continue
+        tail = appended(name, frames[name])
+        frames[name] = read(name) if tail is None else extend(frames[name], tail)
+        if name == 'full_grouped':
+            for view, build in DERIVED.items():
+                if view not in frames:
+                    continue
+                if tail is not None and view in INCREMENTAL:
+                    frames[view] = pd.concat([frames[view], build(tail)], ignore_index=True)
+                else:
+                    frames[view] = build(frames[name])
+    _current = {'frames': frames, 'stamps': stamps}
+    return changed
+
+
+def full_grouped():
+    return get('full_grouped')
+
+
+def country_wise_latest():
+    return get('country_wise_latest')
+
+
+def day_wise():
+    return get('day_wise')
+
+
+def worldometer_data():
+    return get('worldometer_data')
+
+
+def policy_events():
+    return get('policy_events')
+
+
+def animation_frame(df):
+    # plotly express cannot key animation frames on datetime64 values, so animated figures get ISO date labels.
+    return df.assign(Date=df['Date'].dt.strftime('%Y-%m-%d'))
+
+
+def observed(df):
+    # plotly express groups on every category of a categorical column, so subsets must drop the unused ones.
+    cats = df.select_dtypes('category').columns
+    return df.assign(**{c: df[c].cat.remove_unused_categories() for c in cats})
+
+
+def plain(df):
+    # The sunburst hierarchy builder is pathologically slow on categoricals, so hand it plain labels.
+    cats = df.select_dtypes('category').columns
+    return df.astype({c: str for c in cats})
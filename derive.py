@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+# day_wise and country_wise_latest as derived from full_grouped, column for column the tables the original
+# CSVs held. Both take any full_grouped frame; day_wise works on any set of whole dates, so new dates can be
+# totalled on their own and appended.
+COUNTS = ['Confirmed', 'Deaths', 'Recovered', 'Active', 'New cases', 'New deaths', 'New recovered']
+
+
+def ratio(a, b):
+    # As in the published tables, 0/0 is 0 while anything else over 0 stays inf.
+    return np.round(a / b * 100, 2).fillna(0)
+
+
+def rates(df):
+    return df.assign(**{
+        'Deaths / 100 Cases': ratio(df['Deaths'], df['Confirmed']),
+        'Recovered / 100 Cases': ratio(df['Recovered'], df['Confirmed']),
+        'Deaths / 100 Recovered': ratio(df['Deaths'], df['Recovered']),
+    })
+
+
+def day_wise(fg):
+    dates = fg.groupby('Date')
+    days = dates[COUNTS].sum().astype('int32')
+    days['No. of countries'] = dates['Confirmed'].agg(np.count_nonzero).astype('int16')
+    days = rates(days.reset_index())
+    return days[['Date'] + COUNTS + ['Deaths / 100 Cases', 'Recovered / 100 Cases', 'Deaths / 100 Recovered',
+                                     'No. of countries']]
+
+
+def country_wise_latest(fg):
+    latest = fg['Date'].max()
+    now = fg[fg['Date'] == latest].sort_values('Country/Region')
+    week = fg[fg['Date'] == latest - pd.Timedelta(days=7)]
+    week = week.set_index('Country/Region')['Confirmed']
+    cwl = rates(now[['Country/Region', 'WHO Region'] + COUNTS].reset_index(drop=True))
+    last_week = week.reindex(cwl['Country/Region']).fillna(0).astype('int32').to_numpy()
+    cwl['Confirmed last week'] = last_week
+    cwl['1 week change'] = cwl['Confirmed'] - last_week
+    cwl['1 week % increase'] = ratio(cwl['1 week change'], last_week)
+    for c in ['Country/Region', 'WHO Region']:
+        cwl[c] = cwl[c].cat.remove_unused_categories()
+    return cwl[['Country/Region'] + COUNTS + ['Deaths / 100 Cases', 'Recovered / 100 Cases', 'Deaths / 100 Recovered',
+                                              'Confirmed last week', '1 week change', '1 week % increase',
+                                              'WHO Region']]
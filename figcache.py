@@ -0,0 +1,298 @@
+import collections
+import contextvars
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from plotly.io.json import to_json_plotly
+
+import compact
+import config
+import datastore
+
+
+class FigureCache:
+    # Bounded LRU of serialized figures, keyed on callback name, inputs and dataset version. With a ttl, entries
+    # older than ttl seconds count as missing.
+
+    def __init__(self, maxsize, ttl=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl and time.time() - entry[1] > self.ttl:
+            del self._entries[key]
+            entry = None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entry(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def contains(self, key):
+        with self._lock:
+            return self._entry(key) is not None
+
+    def set(self, key, payload):
+        with self._lock:
+            self._entries[key] = (payload, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {'backend': 'memory', 'hits': self.hits, 'misses': self.misses, 'entries': len(self)}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCache:
+    # One file per figure in a directory shared by every worker. Writes go to a temporary file that is
+    # renamed into place, so readers never see a partial figure. Past maxsize files the oldest written are
+    # removed, which also clears out the figures of data versions no longer served.
+
+    def __init__(self, directory, ttl=0, maxsize=0):
+        self.directory = directory
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.json')
+
+    def expired(self, path):
+        return self.ttl and time.time() - os.path.getmtime(path) > self.ttl
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            if self.expired(path):
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, encoding='utf-8') as f:
+                payload = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return payload
+
+    def contains(self, key):
+        path = self.path(key)
+        try:
+            return os.path.exists(path) and not self.expired(path)
+        except FileNotFoundError:
+            return False
+
+    def set(self, key, payload):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self.prune()
+
+    def prune(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                path = os.path.join(self.directory, name)
+                try:
+                    files.append((os.path.getmtime(path), path))
+                except FileNotFoundError:
+                    pass  # Pruned by another worker meanwhile.
+        files.sort()
+        stale = [path for mtime, path in files if self.ttl and time.time() - mtime > self.ttl]
+        if len(files) > self.maxsize > 0:
+            stale += [path for _, path in files[len(stale):len(files) - self.maxsize]]
+        for path in stale:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(self.directory, name))
+
+    def stats(self):
+        entries = sum(name.endswith('.json') for name in os.listdir(self.directory))
+        return {'backend': 'disk', 'hits': self.hits, 'misses': self.misses, 'entries': entries}
+
+
+class RedisCache:
+    # Any server speaking the Redis protocol (redis, valkey, keydb, ...) reachable by all workers.
+    # Needs the optional redis package, which is not in requirements.txt.
+
+    def __init__(self, url, ttl=0):
+        import redis
+
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        # An unreachable server makes the cache miss quickly instead of hanging or failing the callback.
+        self._client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self._error = redis.RedisError
+
+    def get(self, key):
+        try:
+            payload = self._client.get('figcache:' + key)
+        except self._error:
+            self.errors += 1
+            payload = None
+        if payload is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return payload.decode('utf-8')
+
+    def contains(self, key):
+        try:
+            return bool(self._client.exists('figcache:' + key))
+        except self._error:
+            self.errors += 1
+            return False
+
+    def set(self, key, payload):
+        try:
+            self._client.set('figcache:' + key, payload, ex=self.ttl or None)
+        except self._error:
+            self.errors += 1
+
+    def clear(self):
+        for name in self._client.scan_iter('figcache:*'):
+            self._client.delete(name)
+
+    def stats(self):
+        return {'backend': 'redis', 'hits': self.hits, 'misses': self.misses, 'errors': self.errors,
+                'entries': sum(1 for _ in self._client.scan_iter('figcache:*'))}
+
+
+class TieredCache:
+    # Per-worker LRU in front of a shared backend, so hot figures are not re-read from disk or redis.
+
+    def __init__(self, local, shared):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key):
+        payload = self.local.get(key)
+        if payload is None:
+            payload = self.shared.get(key)
+            if payload is not None:
+                self.local.set(key, payload)
+        return payload
+
+    def contains(self, key):
+        return self.local.contains(key) or self.shared.contains(key)
+
+    def set(self, key, payload):
+        self.local.set(key, payload)
+        self.shared.set(key, payload)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def stats(self):
+        return {'local': self.local.stats(), 'shared': self.shared.stats()}
+
+
+def make_cache(backend=config.FIGURE_CACHE_BACKEND):
+    local = FigureCache(config.FIGURE_CACHE_SIZE, config.FIGURE_CACHE_TTL)
+    if backend == 'memory':
+        return local
+    if backend == 'disk':
+        return TieredCache(local, DiskCache(config.FIGURE_CACHE_DIR, config.FIGURE_CACHE_TTL,
+                                            config.FIGURE_CACHE_DISK_SIZE))
+    if backend == 'redis':
+        return TieredCache(local, RedisCache(config.FIGURE_CACHE_URL, config.FIGURE_CACHE_TTL))
+    raise ValueError('Unknown FIGURE_CACHE_BACKEND: %r' % backend)
+
+
+cache = make_cache()
+
+
+# Undecorated callbacks by name, so figures can be built outside a request (see warmup.py).
+registry = {}
+
+# Payload bytes of each figure built by this process, as plotly serializes it and as it is sent.
+sizes = {}
+
+# Cache lookups by callback name and 'hit' or 'miss' (see metrics.py).
+lookups = collections.Counter()
+
+# Set while a request is profiled (see profiling.py), so its figures are built instead of read from the cache.
+bypass = contextvars.ContextVar('bypass', default=False)
+
+
+def serialize(fig):
+    payload = to_json_plotly(fig)
+    if config.FIGURE_COMPACT:
+        return payload, json.dumps(compact.figure(json.loads(payload)), separators=(',', ':'))
+    return payload, payload
+
+
+def compacted(fig):
+    # A figure as callbacks send it, for figures built straight into a page layout.
+    return json.loads(serialize(fig)[1])
+
+
+def build(name, args):
+    payload, sent = serialize(registry[name](*args))
+    sizes[name, tuple(args)] = (len(payload), len(sent))
+    return sent
+
+
+def make_key(name, args):
+    return json.dumps([name, list(args), datastore.version(), config.FIGURE_SETTINGS])
+
+
+def figure(name, args):
+    if bypass.get():
+        return json.loads(build(name, args))
+    key = make_key(name, args)
+    payload = cache.get(key)
+    lookups[name, 'miss' if payload is None else 'hit'] += 1
+    if payload is None:
+        payload = build(name, args)
+        cache.set(key, payload)
+    return json.loads(payload)
+
+
+def memoize(callback):
+    # Figures are kept as the JSON Dash would send; a hit skips plotly express and figure validation entirely.
+    registry[callback.__name__] = callback
+
+    @functools.wraps(callback)
+    def cached(*args):
+        return figure(callback.__name__, args)
+
+    return cached
@@ -0,0 +1,102 @@
+import copy
+import json
+
+from flask import abort, request
+from plotly.io.json import to_json_plotly
+
+from app import server
+import aggregates
+import config
+import datastore
+
+
+# ANIMATED MAPS
+def frame_dates(df, step=None, keyframe=None):
+    step = config.ANIMATION_STEP if step is None else step
+    keyframe = config.ANIMATION_KEYFRAME if keyframe is None else keyframe
+    dates = df['Date'].drop_duplicates().sort_values()
+    if keyframe:
+        return dates.iloc[-1:]
+    # Counted back from the latest date, so the slider always ends on the most recent data.
+    return dates.iloc[::-1].iloc[::step].iloc[::-1]
+
+
+def animation_data(df, step=None, keyframe=None):
+    return datastore.animation_frame(df[df['Date'].isin(frame_dates(df, step, keyframe))])
+
+
+def animation_frame(keyframe=None):
+    keyframe = config.ANIMATION_KEYFRAME if keyframe is None else keyframe
+    return None if keyframe else 'Date'
+
+
+# FRAME STREAMING
+# Animated figures whose frames can be served one range at a time: graph id -> (builder, metrics).
+figures = {}
+
+
+def streams(graph, metrics):
+    def register(build):
+        figures[graph] = (build, metrics)
+        return build
+
+    return register
+
+
+@aggregates.materialized()
+def full_figure(graph, metric):
+    build, metrics = figures[graph]
+    fig = json.loads(to_json_plotly(build(metric)))
+    # Each frame is kept pre-serialized, so a /frames request is only a slice and a join.
+    frames = [json.dumps(frame, separators=(',', ':')) for frame in fig.pop('frames', [])]
+    return fig, frames
+
+
+def frames_version():
+    # Names the frames a figure was built with: the data and the dates picked from it. It is part of every
+    # /frames URL, so cached chunks of older frames are never mixed into a newer figure.
+    return '%s-%d' % (datastore.version(), config.ANIMATION_STEP)
+
+
+def figure(graph, metric):
+    build, metrics = figures[graph]
+    if not config.ANIMATION_STREAM or config.ANIMATION_KEYFRAME:
+        return build(metric)
+
+    # Only the latest frame travels with the figure; assets/frames.js fetches the rest as the slider needs them.
+    fig, frames = full_figure(graph, metric)
+    fig = copy.deepcopy(fig)
+    keyframe = json.loads(frames[-1])
+    fig['data'] = keyframe['data']
+    fig['frames'] = [keyframe]
+    for slider in fig['layout'].get('sliders', []):
+        slider['active'] = len(frames) - 1
+    fig['layout']['meta'] = {'frames_url': '/frames/%s/%s/%s' % (graph, metric, frames_version()), 'frames_count': len(frames),
+                             'frames_chunk': config.ANIMATION_CHUNK}
+    return fig
+
+
+@server.route('/frames/<graph>/<metric>/<version>')
+def serve_frames(graph, metric, version):
+    # Frames of a version no longer served are gone; the page has to be reloaded for the new ones.
+    if graph not in figures or metric not in figures[graph][1] or version != frames_version():
+        abort(404)
+    fig, frames = full_figure(graph, metric)
+
+    date = request.args.get('date')
+    if date is not None:
+        names = [slider_step['label'] for slider_step in fig['layout']['sliders'][0]['steps']]
+        if date not in names:
+            abort(404)
+        start = names.index(date)
+        stop = start + 1
+    else:
+        start = request.args.get('start', 0, type=int)
+        stop = request.args.get('stop', len(frames), type=int)
+
+    response = server.response_class('[' + ','.join(frames[start:stop]) + ']', mimetype='application/json')
+    # The frames only change with the data and the frame settings, both in frames_version.
+    response.set_etag('%s-%s-%s-%d-%d' % (frames_version(), graph, metric, start, stop))
+    response.cache_control.public = True
+    response.cache_control.max_age = config.FRAMES_MAX_AGE
+    return response.make_conditional(request)
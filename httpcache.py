@@ -0,0 +1,130 @@
+import gzip
+import hashlib
+import json
+
+import flask
+
+from app import app, server
+import config
+import datastore
+import figcache
+import refresh  # Its before_request hook runs first, so ETags name the data the callback will see.
+
+try:
+    import brotli  # Optional, not in requirements.txt; without it responses are gzipped.
+except ImportError:
+    brotli = None
+
+# Compression, validators and cache headers for everything the Flask server sends.
+# Callback responses only depend on their inputs, the data version and the figure settings, so a request
+# whose ETag still matches is answered with a 304 before the callback runs. Background callbacks are the
+# exception and are sent without one.
+CALLBACKS = app.config.routes_pathname_prefix + '_dash-update-component'
+ASSETS = app.config.routes_pathname_prefix + app.config.assets_url_path.strip('/') + '/'
+
+COMPRESSIBLE = {'application/json', 'application/javascript', 'text/html', 'text/css', 'text/javascript',
+                'text/plain', 'image/svg+xml'}
+
+# Compressed bodies of responses with an ETag, so the same figure is not compressed again for every client.
+compressed = figcache.FigureCache(config.COMPRESS_CACHE_SIZE)
+
+
+def callback_etag(body):
+    key = json.dumps([datastore.version(), config.FIGURE_SETTINGS]).encode() + body
+    return hashlib.sha1(key).hexdigest()
+
+
+def matches(etag):
+    # The client may hold any encoding of the response; all of them are the same resource.
+    tags = flask.request.if_none_match
+    return any(tags.contains(etag + suffix) for suffix in ('', '-gzip', '-br'))
+
+
+def not_modified(etag, response=None):
+    unchanged = server.response_class(status=304)
+    unchanged.set_etag(etag)
+    if response is not None and response.cache_control:
+        unchanged.headers['Cache-Control'] = response.headers['Cache-Control']
+    return unchanged
+
+
+def encoding():
+    accepted = flask.request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(response, etag):
+    if response.mimetype not in COMPRESSIBLE or 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    method = encoding()
+    if method is None:
+        return response
+    response.direct_passthrough = False  # Static files stream by default; their body is needed here.
+    if response.content_length is not None and response.content_length < config.COMPRESS_MIN_SIZE:
+        return response
+    body = compressed.get((etag, method)) if etag else None
+    if body is None:
+        data = response.get_data()
+        if len(data) < config.COMPRESS_MIN_SIZE:
+            return response
+        if method == 'br':
+            body = brotli.compress(data, quality=config.COMPRESS_LEVEL)
+        else:
+            body = gzip.compress(data, compresslevel=config.COMPRESS_LEVEL, mtime=0)
+        if etag:
+            compressed.set((etag, method), body)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = method
+    if etag:
+        response.set_etag('%s-%s' % (etag, method))
+    return response
+
+
+def cacheable():
+    # A background callback (see background.py) answers the same request first with a job and then with that
+    # job's progress, so neither its start nor its polls (which carry cacheKey) get a validator.
+    if 'cacheKey' in flask.request.args:
+        return False
+    output = (flask.request.get_json(silent=True) or {}).get('output')
+    return not app.callback_map.get(output, {}).get('long')
+
+
+@server.before_request
+def before_request():
+    if flask.request.method == 'POST' and flask.request.path == CALLBACKS and cacheable():
+        flask.g.etag = callback_etag(flask.request.get_data())
+        if matches(flask.g.etag):
+            return not_modified(flask.g.etag)
+
+
+@server.after_request
+def after_request(response):
+    if response.status_code != 200:
+        return response
+    request = flask.request
+    if request.path.startswith(ASSETS) and 'm' in request.args:
+        # Dash adds the file's modification time (?m=) to asset URLs, so a changed file gets a new URL.
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = config.ASSETS_MAX_AGE
+        response.cache_control.immutable = True
+
+    etag = flask.g.get('etag')
+    if etag:
+        response.set_etag(etag)
+    elif request.method == 'GET' and response.mimetype == 'application/json' and not response.get_etag()[0]:
+        # The layout and dependency JSON only change with the code and the data.
+        response.add_etag()
+        response.cache_control.no_cache = True
+    etag = response.get_etag()[0]
+    if etag and matches(etag):
+        return not_modified(etag, response)
+
+    if config.COMPRESS_MIN_SIZE:
+        response = compress(response, etag)
+    return response
@@ -1,9 +1,17 @@
 from dash import dcc, html
 import dash
+import gc
 from app import app
 from app import server
 from layouts import world, who, others
 import callbacks
+import config
+import datastore
+import httpcache
+import metrics
+import profiling
+import refresh
+import warmup
 
 app.layout = html.Div([
     dcc.Location(id='url', refresh=False),
@@ -15,14 +23,35 @@ app.layout = html.Div([
               [dash.dependencies.Input('url', 'pathname')])
 def display_page(pathname):
     if pathname == '/apps/world':
-        return world
+        return world()
     elif pathname == '/apps/who':
-        return who
+        return who()
     elif pathname == '/apps/others':
-        return others
+        return others()
     else:
-        return world
+        return world()
+
+
+metrics.instrument(app)
+profiling.instrument(app)
+
+
+def create_server(preload=False):
+    # App factory for gunicorn: `gunicorn --preload 'index:create_server(preload=True)'` (see Procfile).
+    # With preload the master loads the data, builds every page and warms the figure cache before forking,
+    # so workers start warm and share those pages copy-on-write instead of each holding a private copy.
+    datastore.preload()
+    if preload:
+        world(), who(), others()
+        if config.WARMUP:
+            warmup.run()
+        # Keep the garbage collector from touching (and so un-sharing) the objects built so far.
+        gc.freeze()
+    elif config.WARMUP:
+        warmup.start()
+    return server
 
 
 if __name__ == '__main__':
+    create_server()
     app.run_server(debug=False)
@@ -0,0 +1,363 @@
+import argparse
+import collections
+import gzip
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# Load generator replaying browser sessions against a local gunicorn, for sizing workers and checking caching
+# changes before a deploy.
+#
+#   python loadtest.py --workers 2 --users 8 --duration 60
+#   python loadtest.py --url http://127.0.0.1:8000 --pid <gunicorn master pid>
+#
+# Each simulated user loads the app shell (_dash-layout and _dash-dependencies), opens /apps/world, /apps/who
+# and /apps/others in turn, firing the server callbacks the page triggers on load, then changes the page's
+# dropdowns --flips times. Callbacks and dropdown options are read from the server's own responses, so the
+# sessions follow layouts.py and callbacks.py as they change. Clientside callbacks never reach the server and
+# are skipped; background callbacks are polled until their result arrives. Per-worker memory is read from /proc,
+# so it is only reported on Linux.
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+PAGES = ['/apps/world', '/apps/who', '/apps/others']
+
+# What a browser sends; brotli is left out because urllib cannot decode it for the page responses.
+HEADERS = {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'}
+
+# Seconds before a request, or a background job, counts as failed.
+TIMEOUT = 300
+
+
+# SERVER
+def start_server(workers, port):
+    # As the Procfile runs it, so workers are forked from a preloaded (and, with WARMUP, warmed) master.
+    command = [sys.executable, '-m', 'gunicorn', '--preload', '--workers', str(workers),
+               '--bind', '127.0.0.1:%d' % port, 'index:create_server(preload=True)']
+    return subprocess.Popen(command, cwd=ROOT)
+
+
+def wait_ready(url, process, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit('loadtest: gunicorn exited with status %d' % process.returncode)
+        try:
+            urllib.request.urlopen(url + '/_dash-layout', timeout=5).read()
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.5)
+    raise SystemExit('loadtest: %s not ready after %ds' % (url, timeout))
+
+
+# MEMORY
+def children(pid):
+    found = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open('/proc/%s/stat' % entry) as f:
+                    # The command name in brackets may contain spaces, so fields are counted after it.
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        found.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return sorted(found)
+
+
+def memory(pid):
+    # Resident and proportional set sizes in MB. Preloaded workers share most of their pages with the master,
+    # which RSS counts in full for each of them and PSS splits between them.
+    sizes = {}
+    try:
+        with open('/proc/%d/smaps_rollup' % pid) as f:
+            for line in f:
+                if line.startswith(('Rss:', 'Pss:')):
+                    sizes[line[:3].lower()] = int(line.split()[1]) / 1024
+    except OSError:
+        try:
+            with open('/proc/%d/status' % pid) as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        sizes['rss'] = int(line.split()[1]) / 1024
+        except OSError:
+            pass
+    return sizes
+
+
+class Monitor(threading.Thread):
+    # Samples the memory of every worker of a gunicorn master once a second, keeping the last and peak values.
+
+    def __init__(self, pid):
+        super().__init__(name='monitor', daemon=True)
+        self.pid = pid
+        self.last = {}
+        self.peak = {}
+        self._done = threading.Event()
+
+    def sample(self):
+        for worker in children(self.pid):
+            sizes = memory(worker)
+            if sizes:
+                self.last[worker] = sizes
+                peak = self.peak.setdefault(worker, {})
+                for key, value in sizes.items():
+                    peak[key] = max(peak.get(key, 0), value)
+
+    def run(self):
+        while not self._done.wait(1):
+            self.sample()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.sample()
+
+
+# SESSIONS
+def components(layout):
+    # Every component with an id in a layout tree, by id.
+    found = {}
+    stack = [layout]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict) and 'props' in node:
+            props = node['props']
+            if 'id' in props:
+                found[props['id']] = dict(props, type=node.get('type'))
+            stack.append(props.get('children'))
+    return found
+
+
+def option_values(options):
+    return [o['value'] if isinstance(o, dict) else o for o in options or []]
+
+
+def outputs(output):
+    # Dash joins multiple outputs as '..a.prop...b.prop..'.
+    if output.startswith('..'):
+        return [dict(zip(['id', 'property'], o.rsplit('.', 1))) for o in output[2:-2].split('...')]
+    return dict(zip(['id', 'property'], output.rsplit('.', 1)))
+
+
+def request_body(dependency, values, changed):
+    def prop(p):
+        return {'id': p['id'], 'property': p['property'], 'value': values.get((p['id'], p['property']))}
+
+    return {'output': dependency['output'], 'outputs': outputs(dependency['output']),
+            'inputs': [prop(p) for p in dependency['inputs']], 'state': [prop(p) for p in dependency['state']],
+            'changedPropIds': ['%s.%s' % changed] if changed else []}
+
+
+class User(threading.Thread):
+
+    def __init__(self, url, dependencies, results, deadline, flips, think, seed):
+        super().__init__(name='user-%d' % seed, daemon=True)
+        self.url = url
+        # Only callbacks that run on the server.
+        self.dependencies = [d for d in dependencies if not d.get('clientside_function')]
+        self.results = results
+        self.deadline = deadline
+        self.flips = flips
+        self.think = think
+        self.random = random.Random(seed)
+
+    def send(self, path, body=None):
+        # The bytes that came over the wire and the decoded payload, which is None when the request failed.
+        data = None if body is None else json.dumps(body).encode()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(self.url + path, data=data, headers=HEADERS),
+                                        timeout=TIMEOUT) as response:
+                payload = response.read()
+                encoding = response.headers.get('Content-Encoding')
+        except (urllib.error.URLError, OSError):
+            return 0, None
+        return len(payload), gzip.decompress(payload) if encoding == 'gzip' else payload
+
+    def record(self, name, start, size, ok):
+        self.results[name].append((time.perf_counter() - start, size, ok))
+        if self.think:
+            time.sleep(self.random.uniform(0, 2 * self.think))
+
+    def request(self, name, path, body=None):
+        start = time.perf_counter()
+        size, payload = self.send(path, body)
+        self.record(name, start, size, payload is not None)
+        return payload
+
+    def job(self, name, body, interval):
+        # A background callback answers with a job, which is polled as the renderer does until the result (or,
+        # for a cancelled job, an empty response) arrives. The time recorded is until then.
+        start = time.perf_counter()
+        size, payload = self.send('/_dash-update-component', body)
+        if payload is not None:
+            started = json.loads(payload)
+            # The renderer leaves out a job id that is not truthy (0 for a result that was already stored).
+            query = {'cacheKey': started['cacheKey']}
+            if started['job']:
+                query['job'] = started['job']
+            path = '/_dash-update-component?' + urllib.parse.urlencode(query)
+            payload = b'{}'
+            while payload and 'response' not in json.loads(payload):
+                if time.perf_counter() - start > TIMEOUT:
+                    payload = None
+                    break
+                time.sleep(interval)
+                polled, payload = self.send(path, body)
+                size += polled
+        self.record(name, start, size, payload is not None)
+
+    def fire(self, values, changed=None):
+        # The callbacks a page load (changed=None) or a changed input would send to the server.
+        for dependency in self.dependencies:
+            ids = [(p['id'], p['property']) for p in dependency['inputs']]
+            if not all(i in values for i in ids):
+                continue
+            if changed is None and dependency.get('prevent_initial_call') or changed is not None and changed not in ids:
+                continue
+            body = request_body(dependency, values, changed)
+            if dependency.get('long'):
+                self.job(dependency['output'], body, dependency['long']['interval'] / 1000)
+            else:
+                self.request(dependency['output'], '/_dash-update-component', body)
+
+    def page(self, path):
+        body = {'output': 'page-content.children', 'outputs': {'id': 'page-content', 'property': 'children'},
+                'inputs': [{'id': 'url', 'property': 'pathname', 'value': path}],
+                'changedPropIds': ['url.pathname']}
+        payload = self.request('page ' + path, '/_dash-update-component', body)
+        if payload is None:
+            return
+        found = components(json.loads(payload)['response']['page-content']['children'])
+        values = {}
+        for component_id, props in found.items():
+            for prop, value in props.items():
+                values[component_id, prop] = value
+        self.fire(values)
+
+        dropdowns = [(i, option_values(p.get('options'))) for i, p in found.items() if p['type'] == 'Dropdown']
+        dropdowns = [(i, o) for i, o in dropdowns if len(o) > 1]
+        for _ in range(self.flips if dropdowns else 0):
+            if time.time() > self.deadline:
+                return
+            component_id, options = self.random.choice(dropdowns)
+            current = values.get((component_id, 'value'))
+            values[component_id, 'value'] = self.random.choice([o for o in options if o != current])
+            self.fire(values, (component_id, 'value'))
+
+    def run(self):
+        while time.time() < self.deadline:
+            self.request('layout', '/_dash-layout')
+            self.request('dependencies', '/_dash-dependencies')
+            for path in PAGES:
+                if time.time() > self.deadline:
+                    break
+                self.page(path)
+
+
+# REPORT
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def report(results, seconds, monitor):
+    callbacks = {}
+    for name, samples in sorted(results.items()):
+        times = [t * 1000 for t, _, ok in samples if ok]
+        callbacks[name] = {'requests': len(samples), 'errors': sum(1 for _, _, ok in samples if not ok),
+                           'bytes': round(sum(b for _, b, ok in samples if ok) / max(len(times), 1))}
+        if times:
+            callbacks[name].update({'p50_ms': round(percentile(times, 50), 1),
+                                    'p90_ms': round(percentile(times, 90), 1),
+                                    'p99_ms': round(percentile(times, 99), 1), 'max_ms': round(max(times), 1)})
+    total = sum(c['requests'] for c in callbacks.values())
+    summary = {'seconds': round(seconds, 1), 'requests': total,
+               'errors': sum(c['errors'] for c in callbacks.values()),
+               'requests_per_second': round(total / seconds, 2)}
+    workers = {}
+    if monitor is not None:
+        for worker, sizes in monitor.last.items():
+            workers[worker] = {key + '_mb': round(value, 1) for key, value in sizes.items()}
+            workers[worker].update({'peak_%s_mb' % key: round(value, 1)
+                                    for key, value in monitor.peak[worker].items()})
+    return {'summary': summary, 'callbacks': callbacks, 'workers': workers}
+
+
+def show(result):
+    summary = result['summary']
+    print('loadtest: %d requests in %.1fs, %.2f requests/s, %d errors' % (
+        summary['requests'], summary['seconds'], summary['requests_per_second'], summary['errors']))
+    print('loadtest: %-36s %8s %8s %9s %9s %9s %9s %10s' % ('callback', 'requests', 'errors', 'p50 ms', 'p90 ms',
+                                                           'p99 ms', 'max ms', 'bytes'))
+    for name, c in result['callbacks'].items():
+        print('loadtest: %-36s %8d %8d %9s %9s %9s %9s %10d' % (
+            name, c['requests'], c['errors'], c.get('p50_ms', '-'), c.get('p90_ms', '-'), c.get('p99_ms', '-'),
+            c.get('max_ms', '-'), c['bytes']))
+    for worker, sizes in sorted(result['workers'].items()):
+        print('loadtest: worker %-7d %s' % (worker, '  '.join('%s=%.1f' % item for item in sorted(sizes.items()))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay dashboard sessions against a local gunicorn.')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers to start')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--url', help='use a server that is already running instead of starting gunicorn')
+    parser.add_argument('--pid', type=int, help='gunicorn master pid of the --url server, for worker memory')
+    parser.add_argument('--users', type=int, default=4, help='concurrent sessions')
+    parser.add_argument('--duration', type=float, default=60, help='seconds of load')
+    parser.add_argument('--flips', type=int, default=5, help='dropdown changes per page visit')
+    parser.add_argument('--think', type=float, default=0, help='mean seconds between a user\'s requests')
+    parser.add_argument('--startup', type=int, default=600, help='seconds to wait for the server to start')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the report to this file')
+    arguments = parser.parse_args()
+
+    process = None
+    url = arguments.url
+    pid = arguments.pid
+    if url is None:
+        url = 'http://127.0.0.1:%d' % arguments.port
+        process = start_server(arguments.workers, arguments.port)
+        pid = process.pid
+    try:
+        wait_ready(url, process, arguments.startup)
+        dependencies = json.loads(urllib.request.urlopen(url + '/_dash-dependencies').read())
+        monitor = Monitor(pid) if pid and os.path.isdir('/proc') else None
+        if monitor is not None:
+            monitor.start()
+
+        results = collections.defaultdict(list)
+        start = time.time()
+        users = [User(url, dependencies, results, start + arguments.duration, arguments.flips, arguments.think,
+                      arguments.seed + i) for i in range(arguments.users)]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        seconds = time.time() - start
+        if monitor is not None:
+            monitor.stop()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    result = report(results, seconds, monitor)
+    show(result)
+    if arguments.json:
+        with open(arguments.json, 'w') as f:
+            json.dump(result, f, indent=1, sort_keys=True)
+    return 1 if result['summary']['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
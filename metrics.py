@@ -0,0 +1,143 @@
+import collections
+import json
+import threading
+import time
+
+from dash.exceptions import PreventUpdate
+import flask
+
+from app import server
+import config
+import figcache
+
+# Prometheus text-format metrics for every server callback, page routing (display_page) included, served at
+# /metrics. Each worker counts its own requests, so scrape workers individually or sum across them.
+# A background callback (see background.py) is timed as the requests the web worker answers, labelled
+# stage="start" for the one that starts a job and stage="poll" for the browser's polls; the job itself runs in
+# another process and is not timed here.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Callbacks whose inputs never become labels: page routing takes the raw URL path.
+UNLABELLED = {'page-content.children'}
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            counts = self.series.setdefault(labels, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def lines(self, name):
+        with self._lock:
+            series = dict(self.series)
+        for labels, counts in sorted(series.items()):
+            for bound, count in zip(self.buckets + ('+Inf',), counts[:len(self.buckets)] + [counts[-1]]):
+                yield '%s_bucket%s %d' % (name, label_set(labels + (('le', str(bound)),)), count)
+            yield '%s_sum%s %s' % (name, label_set(labels), repr(float(counts[-2])))
+            yield '%s_count%s %d' % (name, label_set(labels), counts[-1])
+
+
+durations = Histogram(BUCKETS)
+# Response bytes as a summary: a running total and a count per series.
+response_bytes = collections.Counter()
+responses = collections.Counter()
+errors = collections.Counter()
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def label_set(labels):
+    return '{%s}' % ','.join('%s="%s"' % (key, escape(value)) for key, value in labels)
+
+
+# The input labels given out so far, per callback.
+_inputs = {}
+_inputs_lock = threading.Lock()
+
+
+def input_label(callback_id, args):
+    inputs = json.dumps(list(args), default=str)
+    with _inputs_lock:
+        seen = _inputs.setdefault(callback_id, set())
+        if inputs not in seen:
+            if len(seen) >= config.METRICS_INPUT_SERIES:
+                return 'other'
+            seen.add(inputs)
+    return inputs
+
+
+def labels_for(callback_id, args, background=False):
+    labels = (('callback', callback_id),)
+    if background:
+        labels += (('stage', 'poll' if flask.request.args.get('cacheKey') else 'start'),)
+    if config.METRICS_INPUT_LABELS and callback_id not in UNLABELLED:
+        labels += (('inputs', input_label(callback_id, args)),)
+    return labels
+
+
+def timed(callback_id, func, background=False):
+    def run(*args, **kwargs):
+        labels = labels_for(callback_id, args, background)
+        start = time.perf_counter()
+        try:
+            response = func(*args, **kwargs)
+        except PreventUpdate:
+            raise
+        except Exception:
+            errors[labels] += 1
+            raise
+        finally:
+            durations.observe(labels, time.perf_counter() - start)
+        response_bytes[labels] += len(response)
+        responses[labels] += 1
+        return response
+
+    return run
+
+
+def instrument(dash_app):
+    # Wraps the server callbacks registered so far (clientside ones have no function here); called once every
+    # module has registered its callbacks.
+    for callback_id, callback in dash_app.callback_map.items():
+        if 'callback' in callback and not getattr(callback['callback'], 'timed', False):
+            callback['callback'] = timed(callback_id, callback['callback'], bool(callback.get('long')))
+            callback['callback'].timed = True
+
+
+def lines():
+    yield '# HELP dash_callback_duration_seconds Time to run a callback and serialize its output.'
+    yield '# TYPE dash_callback_duration_seconds histogram'
+    yield from durations.lines('dash_callback_duration_seconds')
+
+    yield '# HELP dash_callback_response_bytes Size of callback responses.'
+    yield '# TYPE dash_callback_response_bytes summary'
+    for labels in sorted(responses):
+        yield 'dash_callback_response_bytes_sum%s %d' % (label_set(labels), response_bytes[labels])
+        yield 'dash_callback_response_bytes_count%s %d' % (label_set(labels), responses[labels])
+
+    yield '# HELP dash_callback_errors_total Callbacks that raised an exception.'
+    yield '# TYPE dash_callback_errors_total counter'
+    for labels in sorted(errors):
+        yield 'dash_callback_errors_total%s %d' % (label_set(labels), errors[labels])
+
+    yield '# HELP figure_cache_requests_total Figure cache lookups by callback and result.'
+    yield '# TYPE figure_cache_requests_total counter'
+    for (name, result), count in sorted(figcache.lookups.items()):
+        yield 'figure_cache_requests_total%s %d' % (label_set((('callback', name), ('result', result))), count)
+
+
+@server.route('/metrics')
+def serve_metrics():
+    return server.response_class('\n'.join(lines()) + '\n', mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,37 @@
+import aggregates
+import config
+import datastore
+import figcache
+
+# Figures whose dropdowns mostly change their data. Each page ships the figure for its default choices, the
+# skeleton; a change of choice then sends only what differs from it (see assets/clientside.js): per trace the
+# attributes that changed, and the top-level layout keys that changed, with None for anything removed.
+# The page also records the data version of its skeletons; once the data has been refreshed since, the
+# browser's skeleton is no longer the server's, so whole figures are sent instead.
+SKELETONS = {
+    'fig3_1': ('update_graph3_1', ('Confirmed', 10)),
+    'fig3_4': ('update_graph3_4', ('Confirmed',)),
+    'fig3_6': ('update_graph3_6', ('New cases', 'Poland')),
+}
+
+
+@aggregates.materialized()
+def skeleton(graph):
+    name, args = SKELETONS[graph]
+    return figcache.figure(name, args)
+
+
+def changes(old, new):
+    diff = {key: value for key, value in new.items() if key not in old or old[key] != value}
+    diff.update({key: None for key in old if key not in new})
+    return diff
+
+
+def patch(graph, args, version):
+    fig = figcache.figure(SKELETONS[graph][0], args)
+    if not config.FIGURE_PATCHES or version != datastore.version():
+        return {'figure': fig}
+    base = skeleton(graph)
+    data = [changes(base['data'][i], trace) if i < len(base['data']) else trace
+            for i, trace in enumerate(fig['data'])]
+    return {'data': data, 'layout': changes(base['layout'], fig['layout'])}
@@ -0,0 +1,191 @@
+import cProfile
+import hmac
+import itertools
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+
+import flask
+
+from app import server
+import config
+import figcache
+
+# Opt-in profiling of server callbacks, for when one of them degrades in production. A callback runs under the
+# profiler when PROFILE=1 (all callbacks, or those in PROFILE_CALLBACKS) or when the request carries
+# PROFILE_HEADER set to PROFILE_TOKEN. Profiled requests bypass the figure cache, so the figure is really built.
+#
+# Each profiled request leaves in PROFILE_DIR, named <time>-<pid>-<n>-<callback> (n counts the worker's profiles):
+#   <name>.collapsed  stacks in the collapsed format flamegraph.pl and speedscope read (sample mode)
+#   <name>.prof       cProfile statistics for pstats or snakeviz (cprofile mode)
+#   <name>.json       the seconds spent in each CATEGORIES part, plus the callback and its inputs
+
+# A sample belongs to the innermost frame that comes from one of these, checked in order.
+CATEGORIES = [
+    ('encoding', re.compile(r'[/\\](json|plotly[/\\]io|_plotly_utils[/\\]utils)')),
+    ('validation', re.compile(r'[/\\](_plotly_utils[/\\]basevalidators|plotly[/\\](basedatatypes|validators))')),
+    ('plotly_express', re.compile(r'[/\\]plotly[/\\]express')),
+    ('pandas', re.compile(r'[/\\](pandas|numpy)[/\\]')),
+]
+
+
+def category(filename):
+    for name, pattern in CATEGORIES:
+        if pattern.search(filename):
+            return name
+    return None
+
+
+class Sampler:
+    # Records the stack of one thread every PROFILE_INTERVAL seconds from a helper thread.
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, name='profiler', daemon=True)
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            top = sys._current_frames().get(self.thread_id)
+            stack = []
+            frame = top
+            while frame is not None:
+                code = frame.f_code
+                stack.append('%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                key = (tuple(reversed(stack)), self.classify(top))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    @staticmethod
+    def classify(frame):
+        while frame is not None:
+            name = category(frame.f_code.co_filename)
+            if name:
+                return name
+            frame = frame.f_back
+        return 'other'
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self.start
+
+    def write(self, path):
+        with open(path + '.collapsed', 'w') as f:
+            for (stack, _), count in sorted(self.stacks.items()):
+                f.write('%s %d\n' % (';'.join(stack), count))
+        # Samples arrive less often than the interval asks for, so each part gets its share of the measured time.
+        total = sum(self.stacks.values()) or 1
+        split = {}
+        for (_, name), count in self.stacks.items():
+            split[name] = split.get(name, 0) + count * self.seconds / total
+        return split
+
+
+class Profile:
+    # cProfile, with the same split computed from each function's own time.
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def __enter__(self):
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.disable()
+
+    def write(self, path):
+        self.profile.dump_stats(path + '.prof')
+        stats = pstats.Stats(self.profile).stats
+
+        def classify(function):
+            # Builtins and the standard library (deepcopy, under validation) count towards their nearest caller
+            # that has a part, as the sampler's innermost matching frame would.
+            level, seen = [function], {function}
+            while level:
+                for f in level:
+                    if category(f[0]):
+                        return category(f[0])
+                callers = [c for f in level for c in sorted(stats.get(f, (0, 0, 0, 0, {}))[4],
+                                                            key=lambda c: -stats[f][4][c][3])]
+                level = [c for c in callers if c not in seen]
+                seen.update(level)
+            return 'other'
+
+        split = {}
+        for function, (_, _, own, _, _) in stats.items():
+            name = classify(function)
+            split[name] = split.get(name, 0) + own
+        return split
+
+
+def requested(callback_id):
+    token = config.PROFILE_TOKEN
+    header = flask.request.headers.get(config.PROFILE_HEADER) if flask.has_request_context() else None
+    if token and header and hmac.compare_digest(header, token):
+        return True
+    return config.PROFILE and (not config.PROFILE_CALLBACKS or callback_id in config.PROFILE_CALLBACKS)
+
+
+def profiled(callback_id, func):
+    def run(*args, **kwargs):
+        if not requested(callback_id):
+            return func(*args, **kwargs)
+        profiler = Sampler(threading.get_ident(), config.PROFILE_INTERVAL) if config.PROFILE_MODE == 'sample' \
+            else Profile()
+        token = figcache.bypass.set(True)
+        start = time.perf_counter()
+        try:
+            with profiler:
+                return func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            figcache.bypass.reset(token)
+            save(profiler, callback_id, args, seconds)
+
+    return run
+
+
+_profiles = itertools.count(1)
+
+
+def save(profiler, callback_id, args, seconds):
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    # The worker's pid and a count of its profiles keep concurrent profiles of one callback apart.
+    name = '%s-%d-%d-%s' % (time.strftime('%Y%m%d-%H%M%S'), os.getpid(), next(_profiles),
+                            re.sub(r'[^\w.-]+', '_', callback_id))
+    path = os.path.join(config.PROFILE_DIR, name)
+    split = profiler.write(path)
+    with open(path + '.json', 'w') as f:
+        json.dump({'callback': callback_id, 'inputs': list(args), 'seconds': seconds, 'mode': config.PROFILE_MODE,
+                   'split': split}, f, indent=1, default=str)
+    flask.g.profile = name
+
+
+def instrument(dash_app):
+    # Like metrics.instrument: wraps the server callbacks registered so far.
+    for callback_id, callback in dash_app.callback_map.items():
+        if 'callback' in callback:
+            callback['callback'] = profiled(callback_id, callback['callback'])
+
+
+@server.after_request
+def after_request(response):
+    # Tells whoever asked for the profile which files it went to.
+    name = flask.g.get('profile')
+    if name:
+        response.headers['X-Profile'] = name
+    return response
@@ -0,0 +1,39 @@
+import threading
+import time
+
+from app import server
+import config
+import datastore
+import warmup
+
+# Workers look for updated data files between requests, at most every REFRESH_INTERVAL seconds, and swap
+# them in without a restart. Views, pages and cached figures are all keyed on datastore.version(), so they
+# follow on their own.
+_lock = threading.Lock()
+_checked = time.monotonic()
+
+
+def check():
+    global _checked
+    if not config.REFRESH_INTERVAL or time.monotonic() - _checked < config.REFRESH_INTERVAL:
+        return []
+    # One thread checks while the others carry on serving the current data.
+    if not _lock.acquire(blocking=False):
+        return []
+    try:
+        _checked = time.monotonic()
+        start = time.perf_counter()
+        changed = datastore.refresh()
+        if changed:
+            print('refresh: %s reloaded in %.2fs, version %s' % (', '.join(changed), time.perf_counter() - start,
+                                                                  datastore.version()), flush=True)
+            if config.WARMUP:
+                warmup.start()
+        return changed
+    finally:
+        _lock.release()
+
+
+@server.before_request
+def before_request():
+    check()
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import config
+
+# Columnar snapshots of the data/ CSVs: one .npy file per run of same-typed columns plus a meta.json.
+# Runs are stored as 2-D blocks so pandas can wrap the memory map without consolidating (copying) it later.
+
+
+def source_stamp(csv_path, check=None):
+    check = check or config.SNAPSHOT_CHECK
+    st = os.stat(csv_path)
+    if check == 'hash':
+        with open(csv_path, 'rb') as f:
+            return {'sha1': hashlib.sha1(f.read()).hexdigest()}
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def path(name):
+    return os.path.join(config.SNAPSHOT_DIR, name)
+
+
+def runs(df):
+    # Consecutive numeric or date columns of one dtype share a block; categoricals and strings stand alone.
+    blocks = []
+    for column in df.columns:
+        dtype = df[column].dtype
+        if blocks and dtype.kind in 'biufM' and blocks[-1]['dtype'] == str(dtype):
+            blocks[-1]['columns'].append(column)
+        else:
+            blocks.append({'dtype': str(dtype), 'columns': [column]})
+    return blocks
+
+
+def write(name, df, csv_path):
+    os.makedirs(config.SNAPSHOT_DIR, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=config.SNAPSHOT_DIR, prefix='.' + name + '-')
+    os.chmod(tmp, 0o755)
+    meta = {'source': source_stamp(csv_path, 'mtime'), 'sha1': source_stamp(csv_path, 'hash')['sha1'],
+            'rows': len(df), 'blocks': runs(df)}
+    for i, block in enumerate(meta['blocks']):
+        if block['dtype'] in ('category', 'object'):
+            # Strings are stored like categoricals, as integer codes into a list kept in meta.json.
+            column = df[block['columns'][0]].astype('category')
+            block['categories'] = column.cat.categories.tolist()
+            values = column.cat.codes.values
+        else:
+            values = np.ascontiguousarray(df[block['columns']].values.T)
+        np.save(os.path.join(tmp, '%d.npy' % i), values)
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    # Swap the finished directory in; if another worker got there first, its snapshot is just as good.
+    target = path(name)
+    old = None
+    if os.path.exists(target):
+        old = tempfile.mkdtemp(dir=config.SNAPSHOT_DIR, prefix='.' + name + '-old-')
+        try:
+            os.replace(target, os.path.join(old, name))
+        except OSError:
+            pass
+    try:
+        os.rename(tmp, target)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def fresh(meta, csv_path):
+    stamp = source_stamp(csv_path)
+    if 'sha1' in stamp:
+        return meta['sha1'] == stamp['sha1']
+    return meta['source'] == stamp
+
+
+def load(name, csv_path):
+    # Returns None when there is no snapshot or it is stale, so the caller falls back to the CSV.
+    directory = path(name)
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        if not fresh(meta, csv_path):
+            return None
+        parts = []
+        for i, block in enumerate(meta['blocks']):
+            # Copy-on-write maps: every worker shares the page cache, and pandas may still write if it must.
+            values = np.load(os.path.join(directory, '%d.npy' % i), mmap_mode='c')
+            if block['dtype'] in ('category', 'object'):
+                column = pd.Categorical.from_codes(values, block['categories'])
+                if block['dtype'] == 'object':
+                    column = column.astype(object)
+                parts.append(pd.DataFrame({block['columns'][0]: column}))
+            else:
+                parts.append(pd.DataFrame(values.T, columns=block['columns'], copy=False))
+    except (OSError, ValueError, KeyError):
+        return None
+    return pd.concat(parts, axis=1, copy=False)
+
+
+if __name__ == '__main__':
+    # Build step: python snapshot.py
+    import datastore
+
+    for name in sys.argv[1:] or datastore.FILES:
+        write(name, datastore.read_csv(name), datastore.csv_path(name))
+        print('snapshot: %s -> %s' % (datastore.csv_path(name), path(name)))
@@ -0,0 +1,67 @@
+import concurrent.futures
+import itertools
+import threading
+import time
+
+import config
+import figcache
+
+# The finite input space of every dropdown-driven callback in callbacks.py, matching the options in layouts.py.
+WORLD = ['Confirmed', 'Recovered', 'Deaths']
+WHO_AXES = ['TotalCases', 'TotalDeaths', 'TotalRecovered', 'Population']
+WHO = ['Confirmed', 'Deaths', 'Recovered', 'Active', 'Fatality Rate in %', 'Recovery Rate in %']
+OTHERS = ['Confirmed', 'Recovered', 'Deaths', 'Active']
+TOP_N = [10, 25, 50]
+NEW_CASES = ['New cases', 'New recovered', 'New deaths']
+# The drill-down covers every country; only the default one is worth building ahead of time.
+COUNTRIES = ['Poland']
+
+OPTIONS = {
+    'update_graph1_4': [(v,) for v in WORLD],
+    'update_graph2_2': list(itertools.product(WHO_AXES, WHO_AXES)),
+    'update_graph2_3': [(v,) for v in WHO],
+    'update_graph3_1': list(itertools.product(OTHERS, TOP_N)),
+    'update_graph3_4': [(v,) for v in OTHERS],
+    'update_graph3_5': [(c,) for c in COUNTRIES],
+    'update_graph3_6': list(itertools.product(NEW_CASES, COUNTRIES)),
+}
+
+# Seconds spent building each figure, keyed on (callback name, inputs).
+timings = {}
+
+
+def _build(name, args):
+    start = time.perf_counter()
+    payload = figcache.build(name, args)
+    return payload, time.perf_counter() - start, figcache.sizes[name, args]
+
+
+def missing():
+    # Figures another worker already put in a shared cache are skipped, so restarts come up warm. contains does
+    # not count as a lookup, so the check leaves the hit and miss stats to real requests.
+    return [(name, args) for name, arg_sets in OPTIONS.items() for args in arg_sets
+            if not figcache.cache.contains(figcache.make_key(name, args))]
+
+
+def run(processes=config.WARMUP_PROCESSES):
+    start = time.perf_counter()
+    todo = missing()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {pool.submit(_build, name, args): (name, args) for name, args in todo}
+        for future in concurrent.futures.as_completed(futures):
+            name, args = futures[future]
+            payload, seconds, sizes = future.result()
+            figcache.cache.set(figcache.make_key(name, args), payload)
+            timings[name, args] = seconds
+            figcache.sizes[name, args] = sizes
+            print('warm-up: %s%r built in %.2fs (%d bytes, %d before compaction)' % (name, args, seconds,
+                                                                                    sizes[1], sizes[0]), flush=True)
+    print('warm-up: %d figures in %.2fs' % (len(todo), time.perf_counter() - start), flush=True)
+    return timings
+
+
+def start():
+    # Runs beside the worker instead of blocking its boot; requests that arrive first simply build their own figure.
+    thread = threading.Thread(target=run, name='warmup', daemon=True)
+    thread.start()
+    return thread